@@ -1,28 +1,50 @@
 import sys
-try:
-    import pysqlite3
-    sys.modules["sqlite3"] = pysqlite3
-    sys.modules["sqlite3.dbapi2"] = pysqlite3.dbapi2
-except ImportError:
-    pass
-
+import time
 import streamlit as st
-from health_advisor import (
-    NutritionistAgent, FitnessPlannerAgent, MindfulnessGuideAgent,
-    ScheduleCoordinatorAgent, ProgressReporterAgent,
-    create_meal_plan_task, create_workout_plan_task, create_mindfulness_plan_task,
-    create_integrated_schedule_task, create_progress_report_task
+from llm_clients import prewarm_if_enabled
+from profiles import (
+    GOAL_OPTIONS, DEFAULT_GOALS, DIET_OPTIONS, RESTRICTION_OPTIONS,
+    FITNESS_LEVEL_OPTIONS, EQUIPMENT_OPTIONS, MOOD_OPTIONS,
+    build_user_profile, profile_key
+)
+from history_store import DEFAULT_USER_ID, HistoryStore
+from jobs import DONE, FAILED, QUEUED, RUNNING, JobQueue, QueueFull
+from plan_store import PlanStore
+from run_budget import RunUsage, activate
+from settings import (
+    HISTORY_STORE_PATH, JOB_POLL_SECONDS, JOB_QUEUE_SIZE, JOB_RETENTION_SECONDS, JOB_WORKERS,
+    PARALLEL_PLANNING, PLAN_STORE_PATH,
+    SIMILARITY_CACHE, SIMILARITY_CACHE_SIZE, SIMILARITY_THRESHOLD
 )
-from crewai import Crew, Process
-from datetime import datetime, timedelta
+from similarity_cache import SimilarityCache
 import json
 
+# How many profiles' plans a session keeps around
+MAX_STORED_PLANS = 5
+
+# How many stage outputs a session keeps for incremental regeneration
+MAX_MEMOIZED_STAGES = 50
+
+# Stored results tied to the profile or user they were generated for, which
+# are not reused for a near-identical profile
+PROFILE_SPECIFIC_RESULTS = ("profile", "weekly_report", "history_key", "usage")
+
+STAGE_SPINNERS = {
+    "meal_plan": "🥗 Nutritionist is planning your meals...",
+    "workout_plan": "💪 Fitness Planner is designing your workouts...",
+    "mindfulness_plan": "🧘‍♀️ Mindfulness Guide is preparing your practice...",
+    "integrated_schedule": "📅 Schedule Coordinator is integrating all plans...",
+    "weekly_report": "📊 Progress Reporter is generating your weekly report..."
+}
+
 st.set_page_config(
     page_title="AI Health & Wellness Coach",
     page_icon="🏋️‍♀️",
     layout="wide"
 )
 
+prewarm_if_enabled()
+
 # Custom CSS for better visualization
 st.markdown("""
     <style>
@@ -388,6 +410,495 @@ def display_interaction_arrow():
         </div>
     """, unsafe_allow_html=True)
 
+@st.cache_resource
+def get_plan_store():
+    """Return the store of pre-generated plans shared by every session"""
+    return PlanStore(PLAN_STORE_PATH)
+
+@st.cache_resource
+def get_history_store():
+    """Return the store of users' daily logs shared by every session"""
+    return HistoryStore(HISTORY_STORE_PATH)
+
+@st.cache_resource
+def get_similarity_index():
+    """Return the nearest-profile index over the plan store, shared by every session"""
+    index = SimilarityCache(threshold=SIMILARITY_THRESHOLD, maxsize=SIMILARITY_CACHE_SIZE)
+    for key, profile in get_plan_store().profiles():
+        index.put(profile, key)
+    return index
+
+def similar_plan(user_profile):
+    """Return the stored plan of a near-identical profile, without its per-user results, or None"""
+    if not SIMILARITY_CACHE:
+        return None
+    hit = get_similarity_index().get(user_profile)
+    if hit is None:
+        return None
+    similar_key, distance = hit
+    stored = get_plan_store().get(similar_key)
+    if stored is None:
+        return None
+    results = {name: value for name, value in stored.items() if name not in PROFILE_SPECIFIC_RESULTS}
+    results.update(profile=user_profile, similar_distance=distance)
+    return results
+
+@st.cache_resource
+def get_agent_registry():
+    """Return the agent registry shared by every session in this process"""
+    use_pysqlite3()
+    from health_advisor import AgentRegistry
+    return AgentRegistry()
+
+@st.cache_resource
+def get_job_queue():
+    """Return the background plan generation queue shared by every session"""
+    return JobQueue(workers=JOB_WORKERS, max_pending=JOB_QUEUE_SIZE, retention=JOB_RETENTION_SECONDS)
+
+def plan_job(user_profile, results, history, memo):
+    """Return a job that runs the pipeline stages this profile and history do not have outputs for
+
+    Stage outputs are memoized by the hash of their inputs, so changing one
+    profile field reruns only the stages that read it and those downstream.
+    The job works on its own copies of the session's results and memo, and
+    the session merges what it produced when polling.
+    """
+    # Resolved on the script thread; the job runs on a worker
+    registry = get_agent_registry()
+
+    def run(job):
+        # crewai and the agent module are imported only once a plan is
+        # requested, so rendering the page does not pay for them
+        use_pysqlite3()
+        import metrics
+        from health_advisor import PLAN_PIPELINE, create_delegation_budget, stage_outputs
+
+        values = dict(user_profile, history=history)
+        # Stages already in results, such as a plan served from the plan store,
+        # count as done, so new logs only rerun the weekly report
+        keys = PLAN_PIPELINE.keys(values)
+        for stage, output in stage_outputs(results).items():
+            memo.setdefault(keys[stage], output)
+
+        # Agents come from the process-wide registry; only the crews and tasks
+        # are built per job. Every coworker call made while building this plan
+        # counts against one budget
+        usage = RunUsage()
+        with registry.lease() as team, activate(create_delegation_budget(usage)):
+            PLAN_PIPELINE.run(
+                values, memo, context={"team": team, "usage": usage},
+                parallel=PARALLEL_PLANNING, progress=job.running, done=job.stage_done
+            )
+        metrics.export_if_configured()
+        return {"usage": usage.as_dict(), "memo": memo}
+
+    return run
+
+def submit_plan(user_profile, results, history):
+    """Queue generation of a plan's missing stages and record the job ID in results"""
+    memo = dict(st.session_state.setdefault("stage_memo", {}))
+    results["job_id"] = get_job_queue().submit(
+        # Sessions asking for the same profile and logs share one job
+        profile_key({"profile": user_profile, "history": history}),
+        plan_job(user_profile, dict(results), history, memo),
+        meta={
+            "profile_key": profile_key(user_profile),
+            "profile": user_profile,
+            "history_key": profile_key({"history": history})
+        }
+    )
+
+def collect_plan(results):
+    """Merge the stages a plan's job has finished into results and return its status
+
+    Returns None, and forgets the job, when the queue no longer knows it,
+    for instance after a restart.
+    """
+    status = get_job_queue().status(results["job_id"])
+    if status is None:
+        results.pop("job_id")
+        return None
+    from health_advisor import plan_results
+
+    results.update(plan_results(status["outputs"]))
+    if status["state"] == FAILED:
+        results.pop("job_id")
+        results["error"] = status["error"]
+    elif status["state"] == DONE:
+        results.pop("job_id")
+        results["history_key"] = status["meta"]["history_key"]
+        memo = st.session_state.setdefault("stage_memo", {})
+        memo.update(status["result"]["memo"])
+        while len(memo) > MAX_MEMOIZED_STAGES:
+            memo.pop(next(iter(memo)))
+        # Usage covers every stage generated for this profile, across jobs
+        previous = results.get("usage", {})
+        results["usage"] = {
+            key: previous.get(key, 0) + value for key, value in status["result"]["usage"].items()
+        }
+    return status
+
+def render_plan(results):
+    """Render a generated plan from its stored stage results"""
+    # Create tabs for different stages
+    tab1, tab2, tab3 = st.tabs(["Initial Planning", "Schedule Integration", "Weekly Report"])
+
+    with tab1:
+        st.header("Initial Planning Phase")
+        st.info("Your specialists are discussing and creating their initial recommendations...")
+        
+        # Demo chain_of_thought for Nutritionist
+        nutritionist_chain = [
+            {
+                "title": "# Agent: Nutritionist",
+                "text": "## Thought: I need to create a meal plan that supports the user's fitness goals and energy levels."
+            },
+            {
+                "title": "## Using tool: Ask question to coworker",
+                "tool_input": {
+                    "question": "What time are the main workouts scheduled? This will help me optimize meal timing.",
+                    "context": "I am planning meals for energy and recovery.",
+                    "coworker": "Fitness Planner"
+                },
+                "tool_output": "Workouts are scheduled at 7am and 6pm."
+            },
+            {
+                "title": "## Using tool: Ask question to coworker",
+                "tool_input": {
+                    "question": "Are there any mindfulness practices that require fasting or specific meal timing?",
+                    "context": "I want to avoid meal-meditation conflicts.",
+                    "coworker": "Mindfulness Guide"
+                },
+                "tool_output": "Morning meditation is best before breakfast."
+            }
+        ]
+        display_agent_message(
+            "Nutritionist",
+            "Here's my initial meal plan recommendation...",
+            "🥗",
+            "**Thought Process:** Analyzing user goals, dietary preferences, and collaborating with other agents to optimize meal timing.",
+            chain_of_thought=nutritionist_chain
+        )
+        display_interaction_arrow()
+        # Demo chain_of_thought for Fitness Planner
+        fitness_chain = [
+            {
+                "title": "# Agent: Fitness Planner",
+                "text": "## Thought: I need to design workouts that align with meal timing and energy levels."
+            },
+            {
+                "title": "## Using tool: Ask question to coworker",
+                "tool_input": {
+                    "question": "What are the user's preferred workout times and available equipment?",
+                    "context": "I want to tailor the workout plan.",
+                    "coworker": "Schedule Coordinator"
+                },
+                "tool_output": "Preferred times: 7am, 6pm. Equipment: Yoga mat."
+            }
+        ]
+        display_agent_message(
+            "Fitness Planner",
+            "Here's my initial workout plan recommendation...",
+            "💪",
+            "**Thought Process:** Considering meal timing, user preferences, and collaborating with the team for optimal workout scheduling.",
+            chain_of_thought=fitness_chain
+        )
+        display_interaction_arrow()
+        # Demo chain_of_thought for Mindfulness Guide
+        mindfulness_chain = [
+            {
+                "title": "# Agent: Mindfulness Guide",
+                "text": "## Thought: I need to schedule mindfulness practices that complement meals and workouts."
+            },
+            {
+                "title": "## Using tool: Ask question to coworker",
+                "tool_input": {
+                    "question": "Are there any high-stress periods in the user's day?",
+                    "context": "I want to place meditation sessions for maximum benefit.",
+                    "coworker": "Schedule Coordinator"
+                },
+                "tool_output": "User reports stress in the afternoon."
+            }
+        ]
+        display_agent_message(
+            "Mindfulness Guide",
+            "Here's my initial mindfulness plan recommendation...",
+            "🧘‍♀️",
+            "**Thought Process:** Reviewing user mood and collaborating with the team to optimize meditation timing.",
+            chain_of_thought=mindfulness_chain
+        )
+        display_interaction_arrow()
+        # Demo chain_of_thought for Schedule Coordinator
+        coordinator_chain = [
+            {
+                "title": "# Agent: Schedule Coordinator",
+                "text": "## Thought: I need to integrate all plans into a conflict-free daily schedule."
+            },
+            {
+                "title": "## Using tool: Ask question to coworker",
+                "tool_input": {
+                    "question": "Any last-minute adjustments needed for your plans?",
+                    "context": "I am finalizing the integrated schedule.",
+                    "coworker": "All"
+                },
+                "tool_output": "No further changes."
+            }
+        ]
+        display_agent_message(
+            "Schedule Coordinator",
+            "Here's the integrated initial plan:",
+            "📅",
+            "**Thought Process:** Reviewing all plans and ensuring a harmonious daily flow.",
+            chain_of_thought=coordinator_chain
+        )
+
+    with tab2:
+        st.header("Schedule Integration Phase")
+        st.info("Your Schedule Coordinator is working with the team to create a cohesive daily schedule...")
+        
+        # Display integration process with thought processes
+        display_agent_message(
+            "Schedule Coordinator",
+            "I've reviewed all plans. Let me create an integrated schedule...",
+            "📅",
+            "**Thought Process:** Creating a balanced daily schedule that optimizes energy levels and recovery time between activities."
+        )
+        display_interaction_arrow()
+                
+        display_agent_message(
+            "Nutritionist",
+            "I'll adjust meal timings to better support the workout schedule.",
+            "🥗",
+            "**Thought Process:** Fine-tuning meal timing to ensure optimal energy for workouts and proper recovery nutrition."
+        )
+        display_interaction_arrow()
+                
+        display_agent_message(
+            "Fitness Planner",
+            "I'll modify workout intensity based on meal timing.",
+            "💪",
+            "**Thought Process:** Adjusting workout intensity and duration to align with energy levels from meals."
+        )
+        display_interaction_arrow()
+                
+        display_agent_message(
+            "Mindfulness Guide",
+            "I'll add short meditation breaks between activities.",
+            "🧘‍♀️",
+            "**Thought Process:** Identifying natural transition points for mindfulness practices to enhance overall well-being."
+        )
+        display_interaction_arrow()
+                
+        # Demo chain_of_thought for Schedule Coordinator
+        demo_chain_of_thought = [
+            {
+                "title": "# Agent: Schedule Coordinator",
+                "text": "## Thought: I need to gather insights from the Fitness Planner and Mindfulness Guide to finalize the optimized schedule without timing conflicts."
+            },
+            {
+                "title": "## Using tool: Ask question to coworker",
+                "tool_input": {
+                    "question": "Can you review the current schedule and suggest any adjustments or improvements regarding workout timing and mindfulness practices to enhance overall daily efficiency and energy levels?",
+                    "context": "The daily mindfulness program includes meal timings, workout sessions, meditation, and mindfulness practices. I'm working on creating a cohesive timetable that optimizes transitions between activities and considers energy levels throughout the day. I need your input on workout-related aspects.",
+                    "coworker": "Fitness Planner"
+                },
+                "tool_output": "The Fitness Planner suggests moving the workout to 7am for better energy."
+            },
+            {
+                "title": "## Using tool: Ask question to coworker",
+                "tool_input": {
+                    "question": "Can you review the current schedule and suggest any adjustments or improvements regarding mindfulness practices?",
+                    "context": "The daily schedule includes meal timings, workout sessions, meditation, and mindfulness practices. I'm working on creating a cohesive timetable that optimizes transitions between activities and considers energy levels throughout the day. I need your input on mindfulness-related aspects.",
+                    "coworker": "Mindfulness Guide"
+                },
+                "tool_output": "The Mindfulness Guide recommends a short meditation after lunch."
+            }
+        ]
+        display_agent_message(
+            "Schedule Coordinator",
+            "Here's your final integrated schedule:",
+            "📅",
+            "**Thought Process:** Finalizing the schedule with all adjustments and ensuring a harmonious flow of activities.",
+            chain_of_thought=demo_chain_of_thought
+        )
+        # Demo chain_of_thought for Nutritionist in integration
+        nutritionist_integration_chain = [
+            {
+                "title": "# Agent: Nutritionist",
+                "text": "## Thought: I need to adjust meal timings to better support the new workout schedule."
+            },
+            {
+                "title": "## Using tool: Review schedule",
+                "tool_input": {
+                    "schedule": "Integrated daily schedule with workouts at 7am and 6pm."
+                },
+                "tool_output": "Adjusted breakfast to 8am and dinner to 7pm for optimal recovery."
+            }
+        ]
+        display_agent_message(
+            "Nutritionist",
+            "I've updated meal timings to support the new schedule.",
+            "🥗",
+            "**Thought Process:** Fine-tuning meal timing for optimal energy and recovery.",
+            chain_of_thought=nutritionist_integration_chain
+        )
+        display_interaction_arrow()
+        # Demo chain_of_thought for Fitness Planner in integration
+        fitness_integration_chain = [
+            {
+                "title": "# Agent: Fitness Planner",
+                "text": "## Thought: I need to modify workout intensity based on the new meal timing."
+            },
+            {
+                "title": "## Using tool: Review meal plan",
+                "tool_input": {
+                    "meal_plan": "Breakfast at 8am, dinner at 7pm."
+                },
+                "tool_output": "Scheduled high-intensity workouts after breakfast for best results."
+            }
+        ]
+        display_agent_message(
+            "Fitness Planner",
+            "I've modified workout intensity based on meal timing.",
+            "💪",
+            "**Thought Process:** Adjusting workout intensity and duration to align with energy levels from meals.",
+            chain_of_thought=fitness_integration_chain
+        )
+        display_interaction_arrow()
+        # Demo chain_of_thought for Mindfulness Guide in integration
+        mindfulness_integration_chain = [
+            {
+                "title": "# Agent: Mindfulness Guide",
+                "text": "## Thought: I need to add short meditation breaks between activities."
+            },
+            {
+                "title": "## Using tool: Review schedule",
+                "tool_input": {
+                    "schedule": "Integrated daily schedule with meals and workouts."
+                },
+                "tool_output": "Added 10-minute meditation after lunch and before bed."
+            }
+        ]
+        display_agent_message(
+            "Mindfulness Guide",
+            "I've added short meditation breaks between activities.",
+            "🧘‍♀️",
+            "**Thought Process:** Identifying natural transition points for mindfulness practices.",
+            chain_of_thought=mindfulness_integration_chain
+        )
+        display_interaction_arrow()
+        # Render the final integrated schedule as markdown at the end
+        if "integrated_schedule" in results:
+            st.markdown(results["integrated_schedule"], unsafe_allow_html=True)
+        else:
+            st.caption("The integrated schedule will appear here once the initial plans are ready.")
+
+    with tab3:
+        st.header("Weekly Progress Report")
+        st.info("Your Progress Reporter is analyzing your schedule and preparing recommendations...")
+        
+        # Display reporting process with thought processes
+        display_agent_message(
+            "Progress Reporter",
+            "I'll analyze how well the integrated schedule is working...",
+            "📊",
+            "**Thought Process:** Evaluating schedule adherence and effectiveness, identifying patterns and areas for improvement."
+        )
+        display_interaction_arrow()
+                
+        display_agent_message(
+            "Schedule Coordinator",
+            "Let me provide some insights on schedule effectiveness...",
+            "📅",
+            "**Thought Process:** Analyzing the practical implementation of the schedule and identifying optimization opportunities."
+        )
+        display_interaction_arrow()
+                
+        display_agent_message(
+            "Progress Reporter",
+            "Here's your weekly progress report:",
+            "📊",
+            "**Thought Process:** Compiling insights and recommendations to support continued progress and motivation."
+        )
+        # Render the final weekly report as markdown at the end
+        if "weekly_report" in results:
+            st.markdown(results["weekly_report"], unsafe_allow_html=True)
+        else:
+            st.caption("The weekly report will appear here once the schedule is ready.")
+
+        # Demo chain_of_thought for Progress Reporter
+        progress_reporter_chain = [
+            {
+                "title": "# Agent: Progress Reporter",
+                "text": "## Thought: I need to analyze how well the integrated schedule is working."
+            },
+            {
+                "title": "## Using tool: Review history",
+                "tool_input": {
+                    "history": "User completed 90% of scheduled activities."
+                },
+                "tool_output": "User showed strong commitment and consistency."
+            },
+            {
+                "title": "## Using tool: Suggest improvements",
+                "tool_input": {
+                    "analysis": "Some mindfulness sessions were missed in the afternoon."
+                },
+                "tool_output": "Recommend scheduling mindfulness earlier in the day."
+            }
+        ]
+        display_agent_message(
+            "Progress Reporter",
+            "Here's your weekly progress report:",
+            "📊",
+            "**Thought Process:** Compiling insights and recommendations to support continued progress and motivation.",
+            chain_of_thought=progress_reporter_chain
+        )
+        display_interaction_arrow()
+        # Demo chain_of_thought for Schedule Coordinator in report
+        coordinator_report_chain = [
+            {
+                "title": "# Agent: Schedule Coordinator",
+                "text": "## Thought: I need to provide insights on schedule effectiveness."
+            },
+            {
+                "title": "## Using tool: Review report",
+                "tool_input": {
+                    "report": "Weekly progress report with recommendations."
+                },
+                "tool_output": "Schedule was effective, but flexibility is needed for mindfulness."
+            }
+        ]
+        display_agent_message(
+            "Schedule Coordinator",
+            "Here are my insights on schedule effectiveness.",
+            "📅",
+            "**Thought Process:** Analyzing the practical implementation of the schedule and identifying optimization opportunities.",
+            chain_of_thought=coordinator_report_chain
+        )
+
+    run_usage = results.get("usage")
+    if run_usage is None:
+        return
+    st.caption(
+        f"This plan used {run_usage['llm_calls']} LLM calls ({run_usage['total_tokens']} tokens) "
+        f"and {run_usage['delegations']} coworker delegations "
+        f"({run_usage['refused_delegations']} refused by the delegation budget)."
+    )
+
+def use_pysqlite3():
+    """Swap in pysqlite3 for the stdlib sqlite3 module, which crewai's dependencies need"""
+    try:
+        import pysqlite3
+    except ImportError:
+        return
+    # The plan and history stores import pysqlite3 directly, so its being
+    # loaded does not mean the swap has been made
+    if sys.modules.get("sqlite3") is pysqlite3:
+        return
+    sys.modules["sqlite3"] = pysqlite3
+    sys.modules["sqlite3.dbapi2"] = pysqlite3.dbapi2
+
 def main():
     st.title("🏋️‍♀️ AI Health & Wellness Coach")
     st.markdown("""
@@ -405,427 +916,136 @@ def main():
         st.header("Your Profile")
         goals = st.multiselect(
             "Health Goals",
-            ["Weight Loss", "Muscle Gain", "Stress Reduction", "Better Sleep", "More Energy"],
-            default=["Weight Loss", "More Energy"]
+            GOAL_OPTIONS,
+            default=DEFAULT_GOALS
         )
         
         diet = st.selectbox(
             "Dietary Preference",
-            ["Balanced", "Vegetarian", "Vegan", "Keto", "Mediterranean"]
+            DIET_OPTIONS
         )
         
         restrictions = st.multiselect(
             "Dietary Restrictions",
-            ["No Nuts", "No Dairy", "No Gluten", "No Shellfish", "No Eggs"]
+            RESTRICTION_OPTIONS
         )
         
         fitness_level = st.select_slider(
             "Fitness Level",
-            options=["Beginner", "Intermediate", "Advanced"]
+            options=FITNESS_LEVEL_OPTIONS
         )
         
         equipment = st.multiselect(
             "Available Equipment",
-            ["Yoga Mat", "Resistance Bands", "Dumbbells", "Pull-up Bar", "None"]
+            EQUIPMENT_OPTIONS
         )
         
         mood = st.select_slider(
             "Current Stress Level",
-            options=["Very Stressed", "Stressed", "Neutral", "Calm", "Very Calm"]
+            options=MOOD_OPTIONS
         )
 
-    # Main content area
-    if st.button("Generate My Health Plan"):
-        with st.spinner("Your AI health team is working on your personalized plan..."):
-            # Create user profile
-            user_profile = {
-                "goals": {goal.lower().replace(" ", "_"): True for goal in goals},
-                "preferences": {
-                    "diet": diet.lower(),
-                    "exclude": [r.lower().replace(" ", "_") for r in restrictions]
-                },
-                "fitness_level": fitness_level.lower(),
-                "available_equipment": equipment,
-                "mood": mood.lower()
-            }
+        st.header("Daily Log")
+        user_id = st.text_input("User ID", value=DEFAULT_USER_ID).strip() or DEFAULT_USER_ID
+        with st.form("daily_log", clear_on_submit=True):
+            log_date = st.date_input("Date")
+            workouts_done = st.number_input("Workouts done", min_value=0, step=1)
+            workout_minutes = st.number_input("Workout minutes", min_value=0, step=5)
+            meals_followed = st.number_input("Meals that followed the plan", min_value=0, step=1)
+            meals_planned = st.number_input("Meals planned", min_value=0, value=3, step=1)
+            meditation_minutes = st.number_input("Meditation minutes", min_value=0, step=5)
+            log_mood = st.select_slider("Mood", options=MOOD_OPTIONS)
+            if st.form_submit_button("Save Log"):
+                store = get_history_store()
+                store.log(
+                    user_id, log_date, workouts_done=workouts_done, workout_minutes=workout_minutes,
+                    meals_followed=meals_followed, meals_planned=meals_planned,
+                    meditation_minutes=meditation_minutes, mood=log_mood.lower()
+                )
+                store.flush()
+                st.success(f"Logged {log_date.isoformat()}")
 
-            # Initialize agents
-            nutritionist = NutritionistAgent()
-            fitness_planner = FitnessPlannerAgent()
-            mindfulness_guide = MindfulnessGuideAgent()
-            coordinator = ScheduleCoordinatorAgent()
-            progress_reporter = ProgressReporterAgent()
+    # Main content area
+    user_profile = build_user_profile(goals, diet, restrictions, fitness_level, equipment, mood)
+    key = profile_key(user_profile)
+    history = get_history_store().summary(user_id)
+    plans = st.session_state.setdefault("plans", {})
 
-            # Create tabs for different stages
-            tab1, tab2, tab3 = st.tabs(["Initial Planning", "Schedule Integration", "Weekly Report"])
+    # A reloaded page picks its plan's job back up from the URL
+    job_id = st.query_params.get("job")
+    if job_id and not any(results.get("job_id") == job_id for results in plans.values()):
+        status = get_job_queue().status(job_id)
+        if status is not None and status["state"] in (QUEUED, RUNNING):
+            job_key = status["meta"]["profile_key"]
+            plans.setdefault(job_key, {"profile": status["meta"]["profile"]})["job_id"] = job_id
+            st.session_state["active_plan"] = job_key
 
-            with tab1:
-                st.header("Initial Planning Phase")
-                st.info("Your specialists are discussing and creating their initial recommendations...")
-                
-                # Create and run the crew for initial planning
-                planning_crew = Crew(
-                    agents=[nutritionist, fitness_planner, mindfulness_guide],
-                    tasks=[
-                        create_meal_plan_task(nutritionist, user_profile),
-                        create_workout_plan_task(fitness_planner, user_profile),
-                        create_mindfulness_plan_task(mindfulness_guide, user_profile)
-                    ],
-                    verbose=True,
-                    process=Process.sequential
-                )
+    refresh_report = st.button("Generate My Health Plan")
+    if refresh_report:
+        # Stages already generated for this exact profile are reused, and
+        # profiles pre-generated by warm_cache.py are served from the plan
+        # store, so only a new profile costs LLM calls. With the similarity
+        # cache on, so does a profile close enough to one already stored
+        if key not in plans:
+            plans[key] = get_plan_store().get(key) or similar_plan(user_profile) or {"profile": user_profile}
+        # Clicking again retries a failed generation
+        plans[key].pop("error", None)
+        while len(plans) > MAX_STORED_PLANS:
+            plans.pop(next(iter(plans)))
+        st.session_state["active_plan"] = key
 
-                initial_plans = planning_crew.kickoff()
-                
-                # Demo chain_of_thought for Nutritionist
-                nutritionist_chain = [
-                    {
-                        "title": "# Agent: Nutritionist",
-                        "text": "## Thought: I need to create a meal plan that supports the user's fitness goals and energy levels."
-                    },
-                    {
-                        "title": "## Using tool: Ask question to coworker",
-                        "tool_input": {
-                            "question": "What time are the main workouts scheduled? This will help me optimize meal timing.",
-                            "context": "I am planning meals for energy and recovery.",
-                            "coworker": "Fitness Planner"
-                        },
-                        "tool_output": "Workouts are scheduled at 7am and 6pm."
-                    },
-                    {
-                        "title": "## Using tool: Ask question to coworker",
-                        "tool_input": {
-                            "question": "Are there any mindfulness practices that require fasting or specific meal timing?",
-                            "context": "I want to avoid meal-meditation conflicts.",
-                            "coworker": "Mindfulness Guide"
-                        },
-                        "tool_output": "Morning meditation is best before breakfast."
-                    }
-                ]
-                display_agent_message(
-                    "Nutritionist",
-                    "Here's my initial meal plan recommendation...",
-                    "🥗",
-                    "**Thought Process:** Analyzing user goals, dietary preferences, and collaborating with other agents to optimize meal timing.",
-                    chain_of_thought=nutritionist_chain
-                )
-                display_interaction_arrow()
-                # Demo chain_of_thought for Fitness Planner
-                fitness_chain = [
-                    {
-                        "title": "# Agent: Fitness Planner",
-                        "text": "## Thought: I need to design workouts that align with meal timing and energy levels."
-                    },
-                    {
-                        "title": "## Using tool: Ask question to coworker",
-                        "tool_input": {
-                            "question": "What are the user's preferred workout times and available equipment?",
-                            "context": "I want to tailor the workout plan.",
-                            "coworker": "Schedule Coordinator"
-                        },
-                        "tool_output": "Preferred times: 7am, 6pm. Equipment: Yoga mat."
-                    }
-                ]
-                display_agent_message(
-                    "Fitness Planner",
-                    "Here's my initial workout plan recommendation...",
-                    "💪",
-                    "**Thought Process:** Considering meal timing, user preferences, and collaborating with the team for optimal workout scheduling.",
-                    chain_of_thought=fitness_chain
-                )
-                display_interaction_arrow()
-                # Demo chain_of_thought for Mindfulness Guide
-                mindfulness_chain = [
-                    {
-                        "title": "# Agent: Mindfulness Guide",
-                        "text": "## Thought: I need to schedule mindfulness practices that complement meals and workouts."
-                    },
-                    {
-                        "title": "## Using tool: Ask question to coworker",
-                        "tool_input": {
-                            "question": "Are there any high-stress periods in the user's day?",
-                            "context": "I want to place meditation sessions for maximum benefit.",
-                            "coworker": "Schedule Coordinator"
-                        },
-                        "tool_output": "User reports stress in the afternoon."
-                    }
-                ]
-                display_agent_message(
-                    "Mindfulness Guide",
-                    "Here's my initial mindfulness plan recommendation...",
-                    "🧘‍♀️",
-                    "**Thought Process:** Reviewing user mood and collaborating with the team to optimize meditation timing.",
-                    chain_of_thought=mindfulness_chain
-                )
-                display_interaction_arrow()
-                # Demo chain_of_thought for Schedule Coordinator
-                coordinator_chain = [
-                    {
-                        "title": "# Agent: Schedule Coordinator",
-                        "text": "## Thought: I need to integrate all plans into a conflict-free daily schedule."
-                    },
-                    {
-                        "title": "## Using tool: Ask question to coworker",
-                        "tool_input": {
-                            "question": "Any last-minute adjustments needed for your plans?",
-                            "context": "I am finalizing the integrated schedule.",
-                            "coworker": "All"
-                        },
-                        "tool_output": "No further changes."
-                    }
-                ]
-                display_agent_message(
-                    "Schedule Coordinator",
-                    "Here's the integrated initial plan:",
-                    "📅",
-                    "**Thought Process:** Reviewing all plans and ensuring a harmonious daily flow.",
-                    chain_of_thought=coordinator_chain
-                )
+    # Render from session state so widget interactions after generation do
+    # not discard the plan. Generation runs on the background job queue, so
+    # this script run only submits and polls; a rerun or reload never
+    # cancels it, and finished stages are shown while the rest run
+    active = st.session_state.get("active_plan")
+    if active in plans:
+        results = plans[active]
+        if active != key:
+            st.info("Your profile has changed since this plan was generated. Click the button to update it.")
+        if "similar_distance" in results:
+            st.caption("These plans were first generated for a near-identical profile and reused for yours.")
 
-            with tab2:
-                st.header("Schedule Integration Phase")
-                st.info("Your Schedule Coordinator is working with the team to create a cohesive daily schedule...")
-                
-                # Create and run the crew for schedule integration
-                integration_crew = Crew(
-                    agents=[coordinator, nutritionist, fitness_planner, mindfulness_guide],
-                    tasks=[create_integrated_schedule_task(coordinator, initial_plans, initial_plans, initial_plans)],
-                    verbose=True,
-                    process=Process.sequential
-                )
+        status = collect_plan(results) if "job_id" in results else None
+        # Only plans generated for this profile are stored and indexed; saving
+        # a reused one under this profile would let reuse chain from profile
+        # to profile past the similarity threshold
+        if status is not None and status["state"] == DONE and "similar_distance" not in results:
+            get_plan_store().put(active, results["profile"], results)
+            if SIMILARITY_CACHE:
+                get_similarity_index().put(results["profile"], active)
 
-                integrated_schedule = integration_crew.kickoff()
-                
-                # Display integration process with thought processes
-                display_agent_message(
-                    "Schedule Coordinator",
-                    "I've reviewed all plans. Let me create an integrated schedule...",
-                    "📅",
-                    "**Thought Process:** Creating a balanced daily schedule that optimizes energy levels and recovery time between activities."
-                )
-                display_interaction_arrow()
-                
-                display_agent_message(
-                    "Nutritionist",
-                    "I'll adjust meal timings to better support the workout schedule.",
-                    "🥗",
-                    "**Thought Process:** Fine-tuning meal timing to ensure optimal energy for workouts and proper recovery nutrition."
-                )
-                display_interaction_arrow()
-                
-                display_agent_message(
-                    "Fitness Planner",
-                    "I'll modify workout intensity based on meal timing.",
-                    "💪",
-                    "**Thought Process:** Adjusting workout intensity and duration to align with energy levels from meals."
-                )
-                display_interaction_arrow()
-                
-                display_agent_message(
-                    "Mindfulness Guide",
-                    "I'll add short meditation breaks between activities.",
-                    "🧘‍♀️",
-                    "**Thought Process:** Identifying natural transition points for mindfulness practices to enhance overall well-being."
-                )
-                display_interaction_arrow()
-                
-                # Demo chain_of_thought for Schedule Coordinator
-                demo_chain_of_thought = [
-                    {
-                        "title": "# Agent: Schedule Coordinator",
-                        "text": "## Thought: I need to gather insights from the Fitness Planner and Mindfulness Guide to finalize the optimized schedule without timing conflicts."
-                    },
-                    {
-                        "title": "## Using tool: Ask question to coworker",
-                        "tool_input": {
-                            "question": "Can you review the current schedule and suggest any adjustments or improvements regarding workout timing and mindfulness practices to enhance overall daily efficiency and energy levels?",
-                            "context": "The daily mindfulness program includes meal timings, workout sessions, meditation, and mindfulness practices. I'm working on creating a cohesive timetable that optimizes transitions between activities and considers energy levels throughout the day. I need your input on workout-related aspects.",
-                            "coworker": "Fitness Planner"
-                        },
-                        "tool_output": "The Fitness Planner suggests moving the workout to 7am for better energy."
-                    },
-                    {
-                        "title": "## Using tool: Ask question to coworker",
-                        "tool_input": {
-                            "question": "Can you review the current schedule and suggest any adjustments or improvements regarding mindfulness practices?",
-                            "context": "The daily schedule includes meal timings, workout sessions, meditation, and mindfulness practices. I'm working on creating a cohesive timetable that optimizes transitions between activities and considers energy levels throughout the day. I need your input on mindfulness-related aspects.",
-                            "coworker": "Mindfulness Guide"
-                        },
-                        "tool_output": "The Mindfulness Guide recommends a short meditation after lunch."
-                    }
-                ]
-                display_agent_message(
-                    "Schedule Coordinator",
-                    "Here's your final integrated schedule:",
-                    "📅",
-                    "**Thought Process:** Finalizing the schedule with all adjustments and ensuring a harmonious flow of activities.",
-                    chain_of_thought=demo_chain_of_thought
-                )
-                # Demo chain_of_thought for Nutritionist in integration
-                nutritionist_integration_chain = [
-                    {
-                        "title": "# Agent: Nutritionist",
-                        "text": "## Thought: I need to adjust meal timings to better support the new workout schedule."
-                    },
-                    {
-                        "title": "## Using tool: Review schedule",
-                        "tool_input": {
-                            "schedule": "Integrated daily schedule with workouts at 7am and 6pm."
-                        },
-                        "tool_output": "Adjusted breakfast to 8am and dinner to 7pm for optimal recovery."
-                    }
-                ]
-                display_agent_message(
-                    "Nutritionist",
-                    "I've updated meal timings to support the new schedule.",
-                    "🥗",
-                    "**Thought Process:** Fine-tuning meal timing for optimal energy and recovery.",
-                    chain_of_thought=nutritionist_integration_chain
-                )
-                display_interaction_arrow()
-                # Demo chain_of_thought for Fitness Planner in integration
-                fitness_integration_chain = [
-                    {
-                        "title": "# Agent: Fitness Planner",
-                        "text": "## Thought: I need to modify workout intensity based on the new meal timing."
-                    },
-                    {
-                        "title": "## Using tool: Review meal plan",
-                        "tool_input": {
-                            "meal_plan": "Breakfast at 8am, dinner at 7pm."
-                        },
-                        "tool_output": "Scheduled high-intensity workouts after breakfast for best results."
-                    }
-                ]
-                display_agent_message(
-                    "Fitness Planner",
-                    "I've modified workout intensity based on meal timing.",
-                    "💪",
-                    "**Thought Process:** Adjusting workout intensity and duration to align with energy levels from meals.",
-                    chain_of_thought=fitness_integration_chain
-                )
-                display_interaction_arrow()
-                # Demo chain_of_thought for Mindfulness Guide in integration
-                mindfulness_integration_chain = [
-                    {
-                        "title": "# Agent: Mindfulness Guide",
-                        "text": "## Thought: I need to add short meditation breaks between activities."
-                    },
-                    {
-                        "title": "## Using tool: Review schedule",
-                        "tool_input": {
-                            "schedule": "Integrated daily schedule with meals and workouts."
-                        },
-                        "tool_output": "Added 10-minute meditation after lunch and before bed."
-                    }
-                ]
-                display_agent_message(
-                    "Mindfulness Guide",
-                    "I've added short meditation breaks between activities.",
-                    "🧘‍♀️",
-                    "**Thought Process:** Identifying natural transition points for mindfulness practices.",
-                    chain_of_thought=mindfulness_integration_chain
-                )
-                display_interaction_arrow()
-                # Render the final integrated schedule as markdown at the end
-                st.markdown(format_agent_output(integrated_schedule), unsafe_allow_html=True)
+        # A weekly report written before the user's latest logs is rebuilt
+        # only when asked, so reruns such as typing a user ID cost no LLM calls
+        if "job_id" not in results and "weekly_report" in results \
+                and results.get("history_key") != profile_key({"history": history}):
+            if refresh_report or st.button("Update Weekly Report"):
+                results.pop("weekly_report")
+            else:
+                st.info("Your daily logs have changed since this weekly report was written. Click Update Weekly Report to refresh it.")
+        if "job_id" not in results and "weekly_report" not in results and "error" not in results:
+            try:
+                submit_plan(results["profile"], results, history)
+            except QueueFull as e:
+                st.warning(f"Plan generation is busy: {str(e)}")
 
-            with tab3:
-                st.header("Weekly Progress Report")
-                st.info("Your Progress Reporter is analyzing your schedule and preparing recommendations...")
-                
-                # Simulate history
-                history = [
-                    {"date": (datetime.now() - timedelta(days=i)).strftime("%Y-%m-%d")}
-                    for i in range(7)
-                ]
-
-                # Create and run the crew for weekly report
-                weekly_crew = Crew(
-                    agents=[progress_reporter, coordinator],
-                    tasks=[create_progress_report_task(progress_reporter, history, integrated_schedule)],
-                    verbose=True,
-                    process=Process.sequential
-                )
+        if "error" in results:
+            st.error(f"An error occurred while generating your plan: {results['error']}")
+        if "job_id" in results:
+            status = get_job_queue().status(results["job_id"]) or {}
+            running = status.get("running_stages")
+            st.info(
+                " ".join(STAGE_SPINNERS[stage] for stage in running) if running
+                else "⏳ Your plan is queued and will start shortly..."
+            )
+        render_plan(results)
 
-                weekly_report = weekly_crew.kickoff()
-                
-                # Display reporting process with thought processes
-                display_agent_message(
-                    "Progress Reporter",
-                    "I'll analyze how well the integrated schedule is working...",
-                    "📊",
-                    "**Thought Process:** Evaluating schedule adherence and effectiveness, identifying patterns and areas for improvement."
-                )
-                display_interaction_arrow()
-                
-                display_agent_message(
-                    "Schedule Coordinator",
-                    "Let me provide some insights on schedule effectiveness...",
-                    "📅",
-                    "**Thought Process:** Analyzing the practical implementation of the schedule and identifying optimization opportunities."
-                )
-                display_interaction_arrow()
-                
-                display_agent_message(
-                    "Progress Reporter",
-                    "Here's your weekly progress report:",
-                    "📊",
-                    "**Thought Process:** Compiling insights and recommendations to support continued progress and motivation."
-                )
-                # Render the final weekly report as markdown at the end
-                st.markdown(format_agent_output(weekly_report), unsafe_allow_html=True)
-
-                # Demo chain_of_thought for Progress Reporter
-                progress_reporter_chain = [
-                    {
-                        "title": "# Agent: Progress Reporter",
-                        "text": "## Thought: I need to analyze how well the integrated schedule is working."
-                    },
-                    {
-                        "title": "## Using tool: Review history",
-                        "tool_input": {
-                            "history": "User completed 90% of scheduled activities."
-                        },
-                        "tool_output": "User showed strong commitment and consistency."
-                    },
-                    {
-                        "title": "## Using tool: Suggest improvements",
-                        "tool_input": {
-                            "analysis": "Some mindfulness sessions were missed in the afternoon."
-                        },
-                        "tool_output": "Recommend scheduling mindfulness earlier in the day."
-                    }
-                ]
-                display_agent_message(
-                    "Progress Reporter",
-                    "Here's your weekly progress report:",
-                    "📊",
-                    "**Thought Process:** Compiling insights and recommendations to support continued progress and motivation.",
-                    chain_of_thought=progress_reporter_chain
-                )
-                display_interaction_arrow()
-                # Demo chain_of_thought for Schedule Coordinator in report
-                coordinator_report_chain = [
-                    {
-                        "title": "# Agent: Schedule Coordinator",
-                        "text": "## Thought: I need to provide insights on schedule effectiveness."
-                    },
-                    {
-                        "title": "## Using tool: Review report",
-                        "tool_input": {
-                            "report": "Weekly progress report with recommendations."
-                        },
-                        "tool_output": "Schedule was effective, but flexibility is needed for mindfulness."
-                    }
-                ]
-                display_agent_message(
-                    "Schedule Coordinator",
-                    "Here are my insights on schedule effectiveness.",
-                    "📅",
-                    "**Thought Process:** Analyzing the practical implementation of the schedule and identifying optimization opportunities.",
-                    chain_of_thought=coordinator_report_chain
-                )
+        if "job_id" in results:
+            st.query_params["job"] = results["job_id"]
+            time.sleep(JOB_POLL_SECONDS)
+            st.rerun()
+    if "job" in st.query_params and not any("job_id" in results for results in plans.values()):
+        del st.query_params["job"]
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
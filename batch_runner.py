@@ -0,0 +1,229 @@
+"""Generate plans for many users from a JSONL file of profiles.
+
+Each input line is a JSON object holding a user profile, either directly or
+under a "profile" key, with an optional "id" (the line number is used
+otherwise) and an optional "user_id" whose logged history feeds the weekly
+report (the id is used otherwise). Profiles are validated, run on a pool of workers and written to
+the output JSONL as each one finishes. Re-running with the same output file
+skips every id that already succeeded or was invalid, so an interrupted batch resumes where
+it stopped.
+
+Usage:
+    python batch_runner.py profiles.jsonl results.jsonl --workers 8
+    python batch_runner.py coach_profiles.jsonl results.jsonl --pipeline coach
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import metrics
+from profiles import REQUIRED_PROFILE_FIELDS, validate_profile
+from run_budget import usage_dict
+
+_coaches = threading.local()
+
+
+def run_advisor(user_profile, user_id):
+    """Run health_advisor.run_health_coach and return (results, usage)"""
+    from health_advisor import run_health_coach
+
+    results = run_health_coach(user_profile, user_id=user_id)
+    usage = results.pop("usage")
+    return results, usage
+
+
+def run_coach(user_profile, user_id):
+    """Run HealthCoach.run_health_coach and return (results, usage); the coach keeps no history, so user_id is unused"""
+    from health_coach import HealthCoach
+
+    # A HealthCoach owns its agents, so each worker thread keeps its own
+    coach = getattr(_coaches, "coach", None)
+    if coach is None:
+        coach = _coaches.coach = HealthCoach()
+    output = coach.run_health_coach(user_profile)
+    usage = usage_dict(output.token_usage)
+    results = {
+        "result": output.raw,
+        "tasks": [task_output.raw for task_output in output.tasks_output]
+    }
+    return results, {
+        "llm_calls": usage.get("successful_requests", 0),
+        "total_tokens": usage.get("total_tokens", 0)
+    }
+
+
+PIPELINES = {"advisor": run_advisor, "coach": run_coach}
+
+
+def required_fields(pipeline):
+    """Return the profile fields a pipeline reads"""
+    if pipeline == "coach":
+        from health_coach import HealthCoach
+        return HealthCoach.REQUIRED_FIELDS
+    return REQUIRED_PROFILE_FIELDS
+
+
+def read_profiles(path):
+    """Yield (id, user_id, profile, error) for each line of a JSONL file, one line at a time"""
+    with open(path) as f:
+        for line_no, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield str(line_no), None, None, f"Invalid JSON: {str(e)}"
+                continue
+            if not isinstance(record, dict):
+                yield str(line_no), None, None, f"Invalid record: expected a JSON object, got {type(record).__name__}"
+                continue
+            record_id = str(record.pop("id", line_no))
+            user_id = str(record.pop("user_id", record_id))
+            profile = record.get("profile", record)
+            if not isinstance(profile, dict):
+                yield record_id, user_id, None, f"Invalid profile: expected a JSON object, got {type(profile).__name__}"
+                continue
+            yield record_id, user_id, profile, None
+
+
+def completed_ids(path):
+    """Return the ids that already have a successful or invalid result in the output file
+
+    Failed ids are not included, so they are retried.
+    """
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A line cut short by an interrupted run
+                continue
+            if not isinstance(record, dict) or record.get("id") is None:
+                continue
+            if record.get("status") in ("ok", "invalid"):
+                done.add(str(record["id"]))
+    return done
+
+
+def process(pipeline, record_id, user_id, user_profile):
+    """Run one profile and return the output record"""
+    start = time.perf_counter()
+    try:
+        results, usage = PIPELINES[pipeline](user_profile, user_id)
+        return {
+            "id": record_id,
+            "status": "ok",
+            "results": results,
+            "usage": usage,
+            "elapsed": time.perf_counter() - start
+        }
+    except Exception as e:
+        return {
+            "id": record_id,
+            "status": "error",
+            "error": str(e),
+            "elapsed": time.perf_counter() - start
+        }
+
+
+class BatchSummary:
+    """Running totals for the throughput report"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.ok = 0
+        self.failed = 0
+        self.invalid = 0
+        self.skipped = 0
+        self.tokens = 0
+
+    def add(self, record):
+        if record["status"] == "ok":
+            self.ok += 1
+            self.tokens += record["usage"].get("total_tokens", 0)
+        elif record["status"] == "invalid":
+            self.invalid += 1
+        else:
+            self.failed += 1
+
+    def report(self):
+        minutes = max(time.perf_counter() - self.start, 1e-9) / 60
+        return (
+            f"{self.ok} plans in {minutes:.1f} min: {self.ok / minutes:.1f} plans/min, "
+            f"{self.tokens / minutes:.0f} tokens/min, {self.failed} failures, "
+            f"{self.invalid} invalid, {self.skipped} skipped as already done"
+        )
+
+
+def run_batch(input_path, output_path, pipeline="advisor", workers=4, max_pending=None):
+    """Run every not-yet-completed profile in input_path and append results to output_path"""
+    fields = required_fields(pipeline)
+    done = completed_ids(output_path)
+    summary = BatchSummary()
+    # Bound the in-flight work so the input is streamed rather than loaded
+    max_pending = max_pending or workers * 2
+
+    with open(output_path, "a") as out, ThreadPoolExecutor(max_workers=workers) as executor:
+        def write(record):
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+            summary.add(record)
+            if (summary.ok + summary.failed + summary.invalid) % 10 == 0:
+                print(summary.report())
+
+        def drain(pending, block):
+            if block:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            else:
+                finished = {future for future in pending if future.done()}
+            for future in finished:
+                pending.discard(future)
+                write(future.result())
+
+        pending = set()
+        for record_id, user_id, user_profile, error in read_profiles(input_path):
+            if record_id in done:
+                summary.skipped += 1
+                continue
+            if error is None:
+                try:
+                    validate_profile(user_profile, fields)
+                except ValueError as e:
+                    error = str(e)
+            if error is not None:
+                write({"id": record_id, "status": "invalid", "error": error})
+                continue
+
+            if len(pending) >= max_pending:
+                drain(pending, block=True)
+            pending.add(executor.submit(process, pipeline, record_id, user_id, user_profile))
+            drain(pending, block=False)
+
+        while pending:
+            drain(pending, block=True)
+
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate plans for a JSONL file of profiles")
+    parser.add_argument("input", help="JSONL file of user profiles")
+    parser.add_argument("output", help="JSONL file results are appended to")
+    parser.add_argument("--pipeline", choices=sorted(PIPELINES), default="advisor",
+                        help="advisor: health_advisor.run_health_coach, coach: HealthCoach.run_health_coach")
+    parser.add_argument("--workers", type=int, default=4, help="Profiles processed at once")
+    args = parser.parse_args()
+
+    summary = run_batch(args.input, args.output, pipeline=args.pipeline, workers=args.workers)
+    print(summary.report())
+    metrics.export_if_configured()
+
+
+if __name__ == "__main__":
+    main()
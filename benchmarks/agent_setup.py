@@ -0,0 +1,111 @@
+"""Micro-benchmark of the per-click setup overhead of the crew pipeline.
+
+Compares building a fresh team of five agents on every click (the old
+behaviour) against leasing a team from the shared AgentRegistry. Both paths
+also build the planning, integration and weekly Task and Crew objects, which
+remain per-request allocations. No LLM calls are made.
+
+Usage:
+    python benchmarks/agent_setup.py [--clicks 50]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Agents build their LLM client eagerly; a placeholder key is enough offline
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+from crewai import Crew, Process
+from health_advisor import (
+    AgentRegistry, create_team,
+    create_meal_plan_task, create_workout_plan_task, create_mindfulness_plan_task,
+    create_integrated_schedule_task, create_progress_report_task
+)
+
+USER_PROFILE = {
+    "goals": {"weight_loss": True, "more_energy": True},
+    "preferences": {"diet": "balanced", "exclude": ["no_nuts"]},
+    "fitness_level": "beginner",
+    "available_equipment": ["Yoga Mat"],
+    "mood": "stressed"
+}
+
+HISTORY = [
+    {"date": f"2024-01-0{day}", "workouts_done": 1, "workout_minutes": 30, "meals_followed": 3,
+     "meals_planned": 3, "meditation_minutes": 10, "mood": "calm"}
+    for day in range(1, 8)
+]
+
+
+def build_crews(team):
+    """Build the Task and Crew objects one click needs"""
+    planning = Crew(
+        agents=[team["nutritionist"], team["fitness_planner"], team["mindfulness_guide"]],
+        tasks=[
+            create_meal_plan_task(team["nutritionist"], USER_PROFILE),
+            create_workout_plan_task(team["fitness_planner"], USER_PROFILE),
+            create_mindfulness_plan_task(team["mindfulness_guide"], USER_PROFILE)
+        ],
+        process=Process.sequential
+    )
+    integration = Crew(
+        agents=[team["coordinator"], team["nutritionist"], team["fitness_planner"], team["mindfulness_guide"]],
+        tasks=[create_integrated_schedule_task(team["coordinator"], "meal", "workout", "mindfulness")],
+        process=Process.sequential
+    )
+    weekly = Crew(
+        agents=[team["progress_reporter"], team["coordinator"]],
+        tasks=[create_progress_report_task(team["progress_reporter"], HISTORY, "schedule")],
+        process=Process.sequential
+    )
+    return planning, integration, weekly
+
+
+def time_clicks(clicks, setup):
+    timings = []
+    for _ in range(clicks):
+        start = time.perf_counter()
+        setup()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def report(label, timings):
+    print(f"{label:<28} median {statistics.median(timings):8.2f} ms   "
+          f"p95 {sorted(timings)[int(len(timings) * 0.95) - 1]:8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure per-click agent setup overhead")
+    parser.add_argument("--clicks", type=int, default=50, help="Simulated button clicks per mode")
+    args = parser.parse_args()
+
+    def rebuild_every_click():
+        build_crews(create_team())
+
+    registry = AgentRegistry()
+
+    def lease_from_registry():
+        with registry.lease() as team:
+            build_crews(team)
+
+    # Warm up imports and the shared LLM client before timing either mode
+    rebuild_every_click()
+    lease_from_registry()
+
+    before = time_clicks(args.clicks, rebuild_every_click)
+    after = time_clicks(args.clicks, lease_from_registry)
+
+    print(f"Per-click setup over {args.clicks} clicks")
+    report("Before (new agents):", before)
+    report("After (agent registry):", after)
+    print(f"Speed-up: {statistics.median(before) / statistics.median(after):.1f}x, "
+          f"teams built by registry: {registry.stats()['teams_created']}")
+
+
+if __name__ == "__main__":
+    main()
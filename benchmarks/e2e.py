@@ -0,0 +1,240 @@
+"""End-to-end benchmark of the plan pipelines against a local mock OpenAI API.
+
+Starts benchmarks/mock_openai.py in-process, points the OpenAI SDK,
+LangChain and litellm at it, and runs each pipeline several times:
+
+* simple: SimpleHealthAdvisor as simple_app.py drives it (concurrent initial
+  plans, then the streamed schedule and report)
+* advisor: health_advisor.run_health_coach
+* coach: HealthCoach.run_health_coach
+
+For every pipeline it reports the distribution of total and per-stage wall
+time, taken from the stage metrics, and the LLM calls the mock served per
+run. Nothing leaves the machine and nothing is billed, so pipeline overhead,
+concurrency and caching changes can be compared run for run.
+
+Usage:
+    python benchmarks/e2e.py [--pipelines simple,advisor,coach] [--runs 5]
+        [--latency 0.2] [--tokens-per-second 400] [--completion-tokens 200]
+        [--error-rate 0.0] [--parallel] [--cache] [--json results.json]
+"""
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from mock_openai import MockOpenAIServer
+
+PIPELINES = ("simple", "advisor", "coach")
+
+USER_PROFILE = {
+    "goals": {"weight_loss": True, "more_energy": True},
+    "preferences": {"diet": "balanced", "exclude": ["no_nuts"]},
+    "fitness_level": "beginner",
+    "available_equipment": ["Yoga Mat"],
+    "mood": "stressed"
+}
+
+# HealthCoach reads its own set of fields
+COACH_PROFILE = {
+    "goals": "Weight loss and improved energy levels",
+    "dietary_restrictions": "Vegetarian, no nuts",
+    "fitness_level": "Beginner",
+    "equipment": "Yoga mat, resistance bands",
+    "stress_level": "Moderate",
+    "time_availability": "30 minutes daily",
+    "weekly_activities": "3 workouts, 2 meditation sessions",
+    "achievements": "Completed all planned workouts"
+}
+
+
+def point_clients_at(server, args):
+    """Route every OpenAI client in the process to the mock, before any is built"""
+    os.environ["OPENAI_BASE_URL"] = server.url
+    os.environ["OPENAI_API_BASE"] = server.url
+    os.environ["OPENAI_API_KEY"] = "sk-benchmark"
+    # Keep crewai's telemetry off the network
+    os.environ["OTEL_SDK_DISABLED"] = "true"
+    if not args.keep_rate_limits:
+        # The configured limits would turn a long benchmark into a measure of
+        # the limiter; the mock has no quota to protect
+        os.environ["RATE_LIMIT_RPM"] = "1000000"
+        os.environ["RATE_LIMIT_TPM"] = "1000000000"
+
+
+def build_runner(pipeline, args):
+    """Return a callable that runs one plan through a pipeline"""
+    if pipeline == "simple":
+        from response_cache import ResponseCache
+        from simple_health_advisor import SimpleHealthAdvisor
+
+        # A fresh, zero-size cache per run unless caching is being measured
+        shared_cache = ResponseCache() if args.cache else None
+
+        def run_simple():
+            advisor = SimpleHealthAdvisor(cache=shared_cache or ResponseCache(maxsize=0))
+            meal_plan, workout_plan, mindfulness_plan = advisor.create_initial_plans(USER_PROFILE)
+            schedule = "".join(advisor.stream_integrated_schedule(meal_plan, workout_plan, mindfulness_plan))
+            history = [
+                {"date": (datetime.now() - timedelta(days=i)).strftime("%Y-%m-%d")}
+                for i in range(7)
+            ]
+            "".join(advisor.stream_progress_report(history, schedule))
+        return run_simple
+
+    if pipeline == "advisor":
+        from health_advisor import AgentRegistry, run_health_coach
+
+        registry = AgentRegistry()
+
+        def run_advisor():
+            run_health_coach(USER_PROFILE, parallel=args.parallel, registry=registry)
+        return run_advisor
+
+    from health_coach import HealthCoach
+
+    # Built once, as a batch worker keeps one coach per thread
+    coach = HealthCoach(parallel=args.parallel)
+
+    def run_coach():
+        coach.run_health_coach(COACH_PROFILE)
+    return run_coach
+
+
+def stage_totals():
+    """Return the summed wall time recorded so far for each stage"""
+    import metrics
+
+    totals = {}
+    for series in metrics.STAGE_SECONDS.snapshot():
+        stage = series["labels"]["stage"]
+        totals[stage] = totals.get(stage, 0.0) + series["sum"]
+    return totals
+
+
+def run_pipeline(pipeline, server, args):
+    """Run a pipeline args.runs times and return one record per run"""
+    run = build_runner(pipeline, args)
+    records = []
+    for i in range(args.warmup + args.runs):
+        stages_before = stage_totals()
+        calls_before = server.stats()
+        start = time.perf_counter()
+        error = None
+        try:
+            # The pipelines print their outputs; keep the report readable
+            output = io.StringIO()
+            with contextlib.redirect_stdout(sys.stdout if args.verbose else output):
+                run()
+        except Exception as e:
+            error = str(e)
+        elapsed = time.perf_counter() - start
+        stages_after = stage_totals()
+        calls_after = server.stats()
+        if i < args.warmup:
+            continue
+        records.append({
+            "total": elapsed,
+            "stages": {
+                stage: seconds - stages_before.get(stage, 0.0)
+                for stage, seconds in stages_after.items()
+                if seconds - stages_before.get(stage, 0.0) > 0
+            },
+            "llm_calls": calls_after["requests"] - calls_before["requests"],
+            "injected_errors": calls_after["errors"] - calls_before["errors"],
+            "error": error
+        })
+    return records
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+
+def report(pipeline, records):
+    print(f"\n{pipeline} ({len(records)} runs)")
+    print(f"  {'stage':<24}{'p50 s':>9}{'p95 s':>9}{'max s':>9}")
+
+    def row(label, values):
+        print(f"  {label:<24}{statistics.median(values):9.2f}{percentile(values, 0.95):9.2f}{max(values):9.2f}")
+
+    stages = sorted({stage for record in records for stage in record["stages"]})
+    for stage in stages:
+        row(stage, [record["stages"].get(stage, 0.0) for record in records])
+    row("total", [record["total"] for record in records])
+
+    calls = [record["llm_calls"] for record in records]
+    print(f"  LLM calls per run: median {statistics.median(calls):g}, min {min(calls)}, max {max(calls)}; "
+          f"injected errors: {sum(record['injected_errors'] for record in records)}")
+    failures = [record["error"] for record in records if record["error"]]
+    if failures:
+        print(f"  {len(failures)} failed runs, first error: {failures[0]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the plan pipelines against a mock OpenAI API")
+    parser.add_argument("--pipelines", default=",".join(PIPELINES),
+                        help=f"Comma-separated pipelines to run, from {', '.join(PIPELINES)}")
+    parser.add_argument("--runs", type=int, default=5, help="Timed runs per pipeline")
+    parser.add_argument("--warmup", type=int, default=1, help="Untimed runs per pipeline before timing")
+    parser.add_argument("--latency", type=float, default=0.2, help="Mock seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=400, help="Mock generation speed")
+    parser.add_argument("--completion-tokens", type=int, default=200, help="Tokens in every mock reply")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of mock completions that fail")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for error injection")
+    parser.add_argument("--parallel", action="store_true", help="Run independent planning tasks concurrently")
+    parser.add_argument("--cache", action="store_true", help="Let SimpleHealthAdvisor reuse cached responses across runs")
+    parser.add_argument("--keep-rate-limits", action="store_true",
+                        help="Apply RATE_LIMIT_RPM/RATE_LIMIT_TPM instead of lifting them")
+    parser.add_argument("--verbose", action="store_true", help="Show the pipelines' own output")
+    parser.add_argument("--json", help="Also write every run's measurements to this file")
+    args = parser.parse_args()
+
+    pipelines = [name.strip() for name in args.pipelines.split(",") if name.strip()]
+    unknown = [name for name in pipelines if name not in PIPELINES]
+    if unknown:
+        parser.error(f"Unknown pipelines: {unknown}")
+
+    server = MockOpenAIServer(
+        latency=args.latency, tokens_per_second=args.tokens_per_second,
+        completion_tokens=args.completion_tokens, error_rate=args.error_rate, seed=args.seed
+    )
+    results = {}
+    with server:
+        point_clients_at(server, args)
+        print(f"Mock API at {server.url}: {args.latency}s to first token, "
+              f"{args.completion_tokens} tokens at {args.tokens_per_second:g} tokens/s, "
+              f"{args.error_rate:.0%} errors")
+        for pipeline in pipelines:
+            results[pipeline] = run_pipeline(pipeline, server, args)
+            report(pipeline, results[pipeline])
+
+    # Cumulative over every pipeline run in this process
+    from llm_clients import pool_stats
+    pool = pool_stats()
+    if pool:
+        print(f"\nConnection pool: peak {pool['peak_in_flight']} of {pool['max_connections']} in use, "
+              f"{pool['saturated_requests']}/{pool['requests']} requests waited for a connection, "
+              f"full for {pool['saturated_seconds']:.1f}s")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "results": results, "pool": pool}, f, indent=2)
+
+    failed = any(record["error"] for records in results.values() for record in records)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
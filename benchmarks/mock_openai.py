@@ -0,0 +1,254 @@
+"""Local stand-in for the OpenAI chat completions API, for offline benchmarks.
+
+Serves ``POST /v1/chat/completions`` (whole JSON responses, or server-sent
+events when the request asks to stream) and ``GET /v1/models``. Every
+response waits ``latency`` seconds before the first token and then produces
+``completion_tokens`` tokens at ``tokens_per_second``, so runs are repeatable
+and cost nothing. A fraction ``error_rate`` of completions fail with a 429 or
+5xx response to exercise the retry path.
+
+Usage, to point the apps at it by hand:
+    python benchmarks/mock_openai.py --port 8400 --latency 0.5
+    OPENAI_BASE_URL=http://127.0.0.1:8400/v1 streamlit run app.py
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Statuses injected errors are drawn from
+ERROR_STATUSES = (429, 500, 503)
+
+# Prompts containing this expect a ReAct-style reply, as crewai agents do
+REACT_MARKER = "Final Answer:"
+
+FILLER_WORDS = (
+    "hydrate", "stretch", "protein", "breathe", "walk", "rest", "vegetables",
+    "focus", "sleep", "squat", "journal", "oats", "plank", "recover"
+)
+
+
+class MockOpenAIServer:
+    """OpenAI-compatible HTTP server running in a background thread"""
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.2, tokens_per_second=400,
+                 completion_tokens=200, error_rate=0.0, retry_after=0, seed=0):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.completion_tokens = completion_tokens
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._stats = {}
+        self.reset_stats()
+
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self._server.mock = self
+        self._thread = None
+
+    @property
+    def url(self):
+        """Base URL to use as OPENAI_BASE_URL"""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="mock-openai", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def serve_forever(self):
+        """Serve in the calling thread until interrupted"""
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def stats(self):
+        """Return a copy of the request counters"""
+        with self._lock:
+            return dict(self._stats, models=dict(self._stats["models"]))
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats = {
+                "requests": 0,
+                "errors": 0,
+                "streamed": 0,
+                "prompt_tokens": 0,
+                "completion_tokens": 0,
+                "models": {}
+            }
+
+    def _should_fail(self):
+        with self._lock:
+            if self.error_rate and self._random.random() < self.error_rate:
+                return self._random.choice(ERROR_STATUSES)
+        return None
+
+    def _record(self, model, prompt_tokens, error=False, streamed=False):
+        with self._lock:
+            self._stats["requests"] += 1
+            self._stats["models"][model] = self._stats["models"].get(model, 0) + 1
+            if error:
+                self._stats["errors"] += 1
+                return
+            self._stats["streamed"] += int(streamed)
+            self._stats["prompt_tokens"] += prompt_tokens
+            self._stats["completion_tokens"] += self.completion_tokens
+
+    def completion_words(self, react):
+        """Return the reply as a list of words, one per token"""
+        words = [FILLER_WORDS[i % len(FILLER_WORDS)] for i in range(self.completion_tokens)]
+        if react and words:
+            words[0] = "Thought: I now know the final answer\n" + REACT_MARKER + " " + words[0]
+        return words
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, payload, headers=()):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            self.send_json(200, {"object": "list", "data": [{"id": "gpt-4o", "object": "model"}]})
+        else:
+            self.send_json(404, {"error": {"message": "Not found"}})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self.send_json(400, {"error": {"message": "Invalid JSON body"}})
+            return
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self.send_json(404, {"error": {"message": "Not found"}})
+            return
+
+        mock = self.server.mock
+        model = body.get("model", "unknown")
+        prompt = "".join(str(message.get("content", "")) for message in body.get("messages", []))
+        prompt_tokens = len(prompt) // 4
+
+        status = mock._should_fail()
+        if status is not None:
+            mock._record(model, prompt_tokens, error=True)
+            self.send_json(status, {"error": {"message": "Injected error", "type": "mock_error"}},
+                           headers=[("Retry-After", str(mock.retry_after))])
+            return
+
+        stream = bool(body.get("stream"))
+        mock._record(model, prompt_tokens, streamed=stream)
+        words = mock.completion_words(REACT_MARKER in prompt)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        time.sleep(mock.latency)
+        if stream:
+            self.stream_completion(completion_id, model, words, mock.tokens_per_second)
+            return
+
+        time.sleep(len(words) / mock.tokens_per_second)
+        self.send_json(200, {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": " ".join(words)},
+                "finish_reason": "stop"
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": len(words),
+                "total_tokens": prompt_tokens + len(words)
+            }
+        })
+
+    def stream_completion(self, completion_id, model, words, tokens_per_second, tokens_per_chunk=5):
+        # The stream ends when the connection closes, so no length is needed
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def send_event(delta, finish_reason=None):
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        send_event({"role": "assistant", "content": ""})
+        for i in range(0, len(words), tokens_per_chunk):
+            time.sleep(min(tokens_per_chunk, len(words) - i) / tokens_per_second)
+            text = " ".join(words[i:i + tokens_per_chunk])
+            send_event({"content": text if i == 0 else " " + text})
+        send_event({}, finish_reason="stop")
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local OpenAI-compatible mock server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8400)
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=400, help="Generation speed")
+    parser.add_argument("--completion-tokens", type=int, default=200, help="Tokens in every reply")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of completions that fail")
+    parser.add_argument("--retry-after", type=float, default=0, help="Retry-After seconds sent with errors")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for error injection")
+    args = parser.parse_args()
+
+    server = MockOpenAIServer(
+        host=args.host, port=args.port, latency=args.latency,
+        tokens_per_second=args.tokens_per_second, completion_tokens=args.completion_tokens,
+        error_rate=args.error_rate, retry_after=args.retry_after, seed=args.seed
+    )
+    print(f"Mock OpenAI API listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(server.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Startup benchmark for the Streamlit apps.
+
+Measures, in fresh interpreters so nothing is already imported:
+
+* an import-time breakdown of the app module (``python -X importtime``)
+* time to first paint: from loading Streamlit until the first script run of
+  the app has rendered, using Streamlit's AppTest harness
+* whether the heavy crewai/langchain graph was imported before first paint
+
+Usage:
+    python benchmarks/startup.py [--app app.py] [--runs 5] [--top 15] [--max-first-paint 3.0]
+
+Exits non-zero when the median first paint exceeds --max-first-paint or a
+heavy module is imported before first paint, so it can gate regressions.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that should only be imported once a plan is requested
+HEAVY_MODULES = ["crewai", "langchain", "langchain_openai", "health_advisor"]
+
+FIRST_PAINT_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file({app!r}, default_timeout=120)
+app.run()
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    "first_paint": elapsed,
+    "exceptions": [str(e.value) for e in app.exception],
+    "heavy_imported": [m for m in {heavy!r} if m in sys.modules]
+}}))
+"""
+
+
+def import_time_breakdown(module, top):
+    """Return the cumulative import time of a module and its slowest direct imports"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT, capture_output=True, text=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = len(name) - len(name.lstrip(" "))
+        rows.append((depth, name.strip(), int(cumulative_us)))
+
+    # importtime lists a module after everything it imported, so the module's
+    # direct imports are the lines one level deeper just above its own line
+    index = max(i for i, row in enumerate(rows) if row[1] == module)
+    module_depth, _, total_us = rows[index]
+    direct = []
+    for depth, name, cumulative_us in reversed(rows[:index]):
+        if depth <= module_depth:
+            break
+        if depth == module_depth + 2:
+            direct.append((name, cumulative_us))
+    slowest = sorted(direct, key=lambda item: item[1], reverse=True)[:top]
+    return total_us / 1e6, slowest
+
+
+def first_paint(app):
+    """Run the app once in a fresh interpreter and return its first-paint measurement"""
+    # Timed from inside the child so interpreter start-up noise is excluded
+    script = FIRST_PAINT_SCRIPT.format(app=app, heavy=HEAVY_MODULES)
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=REPO_ROOT, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"First paint run failed:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure Streamlit app startup time")
+    parser.add_argument("--app", default="app.py", help="Streamlit script to measure")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh-process runs for first paint")
+    parser.add_argument("--top", type=int, default=15, help="Slowest imports to list")
+    parser.add_argument("--max-first-paint", type=float, default=None,
+                        help="Fail if the median first paint exceeds this many seconds")
+    args = parser.parse_args()
+
+    module = os.path.splitext(os.path.basename(args.app))[0]
+    total, slowest = import_time_breakdown(module, args.top)
+    print(f"Import time for {module}: {total:.3f}s")
+    for name, cumulative_us in slowest:
+        print(f"  {name:<30} {cumulative_us / 1e6:8.3f}s")
+
+    runs = [first_paint(args.app) for _ in range(args.runs)]
+    timings = [run["first_paint"] for run in runs]
+    median = statistics.median(timings)
+    print(f"\nTime to first paint over {args.runs} runs: "
+          f"median {median:.3f}s, min {min(timings):.3f}s, max {max(timings):.3f}s")
+
+    failed = False
+    heavy = sorted({module for run in runs for module in run["heavy_imported"]})
+    if heavy:
+        print(f"Heavy modules imported before first paint: {', '.join(heavy)}")
+        failed = True
+    exceptions = [e for run in runs for e in run["exceptions"]]
+    if exceptions:
+        print(f"Exceptions during first paint: {exceptions[0]}")
+        failed = True
+    if args.max_first_paint is not None and median > args.max_first_paint:
+        print(f"Median first paint {median:.3f}s exceeds the {args.max_first_paint:.3f}s budget")
+        failed = True
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
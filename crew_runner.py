@@ -0,0 +1,45 @@
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from crewai import Crew, Process
+from crewai.crews.crew_output import CrewOutput
+from log_sink import crew_options
+from run_budget import usage_dict
+
+
+def combine_outputs(outputs):
+    """Merge single-task crew outputs into one CrewOutput, keeping task order"""
+    tasks_output = [output.tasks_output[0] for output in outputs]
+    token_usage = {}
+    for output in outputs:
+        for key, value in usage_dict(output.token_usage).items():
+            if isinstance(value, (int, float)):
+                token_usage[key] = token_usage.get(key, 0) + value
+    return CrewOutput(
+        raw=tasks_output[-1].raw,
+        tasks_output=tasks_output,
+        token_usage=token_usage
+    )
+
+
+def kickoff(agents, tasks, parallel=False):
+    """Run independent tasks as a crew, optionally executing them concurrently
+
+    In parallel mode every task runs in its own single-task crew and the
+    results are joined into one CrewOutput with ``tasks_output`` in the
+    original task order, so callers see the same shape either way.
+    """
+    if not parallel or len(tasks) < 2:
+        crew = Crew(agents=agents, tasks=tasks, process=Process.sequential, **crew_options())
+        return crew.kickoff()
+
+    def run(task):
+        # Coworkers are copied so a delegated question never runs on an agent
+        # that is busy with its own task in another thread; model_copy keeps
+        # the agent's own class, unlike Agent.copy
+        crew_agents = [task.agent] + [agent.model_copy() for agent in agents if agent is not task.agent]
+        crew = Crew(agents=crew_agents, tasks=[task], process=Process.sequential, **crew_options())
+        return crew.kickoff()
+
+    with ThreadPoolExecutor(max_workers=len(tasks)) as executor:
+        futures = [executor.submit(contextvars.copy_context().run, run, task) for task in tasks]
+        return combine_outputs([future.result() for future in futures])
@@ -1,20 +1,57 @@
+import threading
+from contextlib import contextmanager
 from crewai import Agent, Task, Crew, Process
-from datetime import datetime, timedelta
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
+from history_store import DEFAULT_USER_ID, get_history_store
+import metrics
+from llm_clients import get_llm
+from log_sink import crew_options, get_logger, show_output
+from model_router import ROLE_STAGES, model_router
+from pipeline import Pipeline, Stage
+from plan_schemas import MealPlan, WorkoutPlan, MindfulnessPlan, StagePlan, json_instructions, stage_text
+from profiles import profile_key, validate_profile
+from scheduler import build_schedule
+from run_budget import DelegationBudget, RunUsage, activate, current_budget
+from settings import (
+    PARALLEL_PLANNING, MAX_DELEGATION_DEPTH, MAX_COWORKER_CALLS_PER_TASK, STRUCTURED_PLANS,
+    LOCAL_SCHEDULER, SCHEDULE_NARRATIVE, MEAL_WORKOUT_GAP_MINUTES, ACTIVITY_BUFFER_MINUTES, VERBOSE
+)
 
 load_dotenv()
 
-# Create a shared LLM instance for all agents
-llm = ChatOpenAI(model="gpt-4o", temperature=0.7)
+def shared_llm(model=None):
+    """Return the LLM shared by every agent on a model (the large tier by default), built on first use"""
+    return get_llm(model=model or model_router.tiers["large"], temperature=0.7)
+
+def llm_model(llm):
+    """Return the model name of a LangChain or crewai LLM"""
+    return getattr(llm, "model_name", None) or getattr(llm, "model", None)
 
 # -- Agent Definitions --
 
-class NutritionistAgent(Agent):
+class HealthAgent(Agent):
+    """
+    Base agent whose task executions, including coworker calls, respect the active delegation budget.
+    """
+    def execute_task(self, task, context=None, tools=None):
+        budget = current_budget()
+        if budget is None:
+            return self._execute_routed(task, context, tools)
+        with budget.enter() as refusal:
+            if refusal:
+                return refusal
+            return self._execute_routed(task, context, tools)
+
+    def _execute_routed(self, task, context, tools):
+        # Task durations feed the router's per-stage latency windows
+        with metrics.agent_role(self.role), model_router.timed(ROLE_STAGES.get(self.role), llm_model(self.llm)):
+            return super().execute_task(task, context=context, tools=tools)
+
+class NutritionistAgent(HealthAgent):
     """
     Suggests daily meal plans based on user goals and collaborates with other agents.
     """
-    def __init__(self, llm=llm):
+    def __init__(self, llm=None):
         super().__init__(
             role='Nutritionist',
             goal='Create personalized meal plans that align with user health goals and complement workout schedules',
@@ -22,78 +59,84 @@ class NutritionistAgent(Agent):
             balanced, healthy meal plans. You understand how nutrition affects workout 
             performance and recovery. You collaborate with fitness trainers to ensure 
             meal timing aligns with exercise schedules.""",
-            verbose=True,
+            verbose=VERBOSE,
             allow_delegation=True,
-            llm=llm
+            llm=llm or shared_llm()
         )
 
-class FitnessPlannerAgent(Agent):
+class FitnessPlannerAgent(HealthAgent):
     """
     Crafts workouts and collaborates with nutritionist for optimal timing.
     """
-    def __init__(self, llm=llm):
+    def __init__(self, llm=None):
         super().__init__(
             role='Fitness Planner',
             goal='Design effective workouts that complement meal timing and energy levels',
             backstory="""You are a certified fitness trainer specializing in home workouts 
             and bodyweight exercises. You understand the importance of proper nutrition 
             timing and work closely with nutritionists to optimize workout schedules.""",
-            verbose=True,
+            verbose=VERBOSE,
             allow_delegation=True,
-            llm=llm
+            llm=llm or shared_llm()
         )
 
-class MindfulnessGuideAgent(Agent):
+class MindfulnessGuideAgent(HealthAgent):
     """
     Offers meditation and stress management, coordinating with other activities.
     """
-    def __init__(self, llm=llm):
+    def __init__(self, llm=None):
         super().__init__(
             role='Mindfulness Guide',
             goal='Provide meditation and stress management techniques that complement daily activities',
             backstory="""You are a mindfulness expert who understands how meditation 
             and stress management can enhance workout performance and eating habits. 
             You coordinate with other specialists to find optimal times for practice.""",
-            verbose=True,
+            verbose=VERBOSE,
             allow_delegation=True,
-            llm=llm
+            llm=llm or shared_llm()
         )
 
-class ScheduleCoordinatorAgent(Agent):
+class ScheduleCoordinatorAgent(HealthAgent):
     """
     Coordinates and integrates all activities into a cohesive daily schedule.
     """
-    def __init__(self, llm=llm):
+    def __init__(self, llm=None):
         super().__init__(
             role='Schedule Coordinator',
             goal='Create a balanced daily schedule that optimizes all health activities',
             backstory="""You are an expert in time management and health optimization. 
             You take inputs from nutritionists, fitness trainers, and mindfulness guides 
             to create a harmonious daily schedule that maximizes the benefits of each activity.""",
-            verbose=True,
+            verbose=VERBOSE,
             allow_delegation=True,
-            llm=llm
+            llm=llm or shared_llm()
         )
 
-class ProgressReporterAgent(Agent):
+class ProgressReporterAgent(HealthAgent):
     """
     Generates a weekly health recap and motivational note.
     """
-    def __init__(self, llm=llm):
+    def __init__(self, llm=None):
         super().__init__(
             role='Progress Reporter',
             goal='Track and report on user progress while providing motivation',
             backstory="""You are a health coach who specializes in tracking progress 
             and providing motivational support. You analyze the effectiveness of the 
             integrated schedule and suggest improvements.""",
-            verbose=True,
+            verbose=VERBOSE,
             allow_delegation=True,
-            llm=llm
+            llm=llm or shared_llm()
         )
 
 # -- Task Definitions --
 
-def create_meal_plan_task(nutritionist, user_input):
+def plan_output(model, structured, expected_output):
+    """Return the Task output arguments of a planning task, prose or structured"""
+    if not structured:
+        return {"expected_output": expected_output}
+    return {"expected_output": json_instructions(model), "output_pydantic": model}
+
+def create_meal_plan_task(nutritionist, user_input, structured=False):
     return Task(
         description=f"""Create a personalized meal plan based on the following:
         Goals: {user_input['goals']}
@@ -112,15 +155,15 @@ def create_meal_plan_task(nutritionist, user_input):
         Include breakfast, lunch, dinner, and snacks.
         Provide nutritional information and portion sizes.""",
         agent=nutritionist,
-        expected_output="""A detailed meal plan including:
+        **plan_output(MealPlan, structured, """A detailed meal plan including:
         1. Daily meal schedule with specific times
         2. Specific food items and portions
         3. Nutritional information
         4. Preparation instructions
-        5. Notes on how it complements workouts and meditation"""
+        5. Notes on how it complements workouts and meditation""")
     )
 
-def create_workout_plan_task(fitness_planner, user_input):
+def create_workout_plan_task(fitness_planner, user_input, structured=False):
     return Task(
         description=f"""Design a workout plan considering:
         Fitness Level: {user_input['fitness_level']}
@@ -139,16 +182,16 @@ def create_workout_plan_task(fitness_planner, user_input):
         Include warm-up, main exercises, and cool-down.
         Provide detailed instructions and modifications.""",
         agent=fitness_planner,
-        expected_output="""A comprehensive workout plan including:
+        **plan_output(WorkoutPlan, structured, """A comprehensive workout plan including:
         1. Workout schedule with specific times
         2. Warm-up routine
         3. Main exercises with sets and reps
         4. Cool-down exercises
         5. Modifications for different fitness levels
-        6. Notes on how it complements meals and meditation"""
+        6. Notes on how it complements meals and meditation""")
     )
 
-def create_mindfulness_plan_task(mindfulness_guide, user_input):
+def create_mindfulness_plan_task(mindfulness_guide, user_input, structured=False):
     return Task(
         description=f"""Create a mindfulness plan based on:
         Current Mood: {user_input['mood']}
@@ -165,12 +208,12 @@ def create_mindfulness_plan_task(mindfulness_guide, user_input):
         
         Include meditation techniques, breathing exercises, and stress management tips.""",
         agent=mindfulness_guide,
-        expected_output="""A mindfulness program including:
+        **plan_output(MindfulnessPlan, structured, """A mindfulness program including:
         1. Meditation schedule with specific times
         2. Meditation techniques
         3. Breathing exercises
         4. Stress management strategies
-        5. Notes on how it complements meals and workouts"""
+        5. Notes on how it complements meals and workouts""")
     )
 
 def create_integrated_schedule_task(coordinator, meal_plan, workout_plan, mindfulness_plan):
@@ -203,7 +246,7 @@ def create_integrated_schedule_task(coordinator, meal_plan, workout_plan, mindfu
 def create_progress_report_task(progress_reporter, history, integrated_schedule):
     return Task(
         description=f"""Generate a weekly progress report based on:
-        History: {history}
+        Progress summary (this and last week's rollups, and streaks): {history}
         Current Schedule: {integrated_schedule}
         
         Analyze:
@@ -223,72 +266,301 @@ def create_progress_report_task(progress_reporter, history, integrated_schedule)
         5. Next week's goals"""
     )
 
-def run_health_coach(user_profile):
-    try:
-        # Initialize agents
-        nutritionist = NutritionistAgent(llm=llm)
-        fitness_planner = FitnessPlannerAgent(llm=llm)
-        mindfulness_guide = MindfulnessGuideAgent(llm=llm)
-        coordinator = ScheduleCoordinatorAgent(llm=llm)
-        progress_reporter = ProgressReporterAgent(llm=llm)
-
-        # Create initial planning tasks
-        meal_task = create_meal_plan_task(nutritionist, user_profile)
-        workout_task = create_workout_plan_task(fitness_planner, user_profile)
-        mindfulness_task = create_mindfulness_plan_task(mindfulness_guide, user_profile)
-
-        # Create and run the crew for initial planning
-        planning_crew = Crew(
-            agents=[nutritionist, fitness_planner, mindfulness_guide],
-            tasks=[meal_task, workout_task, mindfulness_task],
-            verbose=True,
-            process=Process.sequential
-        )
+PLAN_STAGES = ["meal_plan", "workout_plan", "mindfulness_plan"]
 
-        # Get initial plans
-        initial_plans = planning_crew.kickoff()
-        print("\n--- Initial Plans ---")
-        print(initial_plans)
-
-        # Create and run the crew for schedule integration
-        integration_crew = Crew(
-            agents=[coordinator, nutritionist, fitness_planner, mindfulness_guide],
-            tasks=[create_integrated_schedule_task(coordinator, initial_plans, initial_plans, initial_plans)],
-            verbose=True,
-            process=Process.sequential
-        )
+def schedule_narrative_prompt(schedule):
+    adjustments = "\n".join(schedule.adjustments) or "None"
+    return f"""You are the Schedule Coordinator. In one short paragraph, explain to the user
+    how this day fits together: energy levels through the day, and why activities are
+    spaced the way they are. Do not change or restate every time.
+
+    Schedule:
+    {schedule.compact()}
+
+    Adjustments made:
+    {adjustments}"""
+
+def create_delegation_budget(usage=None):
+    """Build the per-run delegation budget from the configured limits"""
+    return DelegationBudget(
+        max_depth=MAX_DELEGATION_DEPTH,
+        max_calls_per_task=MAX_COWORKER_CALLS_PER_TASK,
+        usage=usage
+    )
+
+# Team key -> agent class
+TEAM_AGENTS = {
+    "nutritionist": NutritionistAgent,
+    "fitness_planner": FitnessPlannerAgent,
+    "mindfulness_guide": MindfulnessGuideAgent,
+    "coordinator": ScheduleCoordinatorAgent,
+    "progress_reporter": ProgressReporterAgent
+}
+
+TEAM_ROLES = {
+    "nutritionist": "Nutritionist",
+    "fitness_planner": "Fitness Planner",
+    "mindfulness_guide": "Mindfulness Guide",
+    "coordinator": "Schedule Coordinator",
+    "progress_reporter": "Progress Reporter"
+}
+
+def team_models():
+    """Return the model each team member is currently routed to"""
+    return {name: model_router.role_model(role) for name, role in TEAM_ROLES.items()}
+
+def create_team(models=None):
+    """Build one of each agent, keyed by the name the stage functions use, on their routed models"""
+    models = models or team_models()
+    return {name: agent_class(llm=shared_llm(models[name])) for name, agent_class in TEAM_AGENTS.items()}
+
+class AgentRegistry:
+    """
+    Thread-safe pool of agent teams shared by every run in the process.
+
+    Agents hold per-execution state, so each team is leased to one run at a
+    time. A new team is built only when every existing one is in use, so in
+    steady state a run allocates nothing but its Crew and Task objects.
+    Idle teams are pooled by the models their agents use, so a lease always
+    gets agents on the models the router currently picks for their stages.
+    """
+    def __init__(self):
+        self._idle = {}
+        self._lock = threading.Lock()
+        self.teams_created = 0
+
+    @contextmanager
+    def lease(self):
+        models = team_models()
+        key = tuple(sorted(models.items()))
+        with self._lock:
+            idle = self._idle.get(key)
+            team = idle.pop() if idle else None
+        if team is None:
+            team = create_team(models)
+            with self._lock:
+                self.teams_created += 1
+        try:
+            yield team
+        finally:
+            with self._lock:
+                self._idle.setdefault(key, []).append(team)
+
+    def stats(self):
+        with self._lock:
+            return {"teams_created": self.teams_created, "idle": sum(len(idle) for idle in self._idle.values())}
+
+agent_registry = AgentRegistry()
+
+def load_history(user_id=DEFAULT_USER_ID):
+    """Return a user's progress summary: this and last week's rollups, and their streaks"""
+    return get_history_store().summary(user_id)
+
+# -- Pipeline Stages --
 
-        # Get integrated schedule
-        integrated_schedule = integration_crew.kickoff()
-        print("\n--- Integrated Schedule ---")
-        print(integrated_schedule)
-
-        # Simulate storing daily outputs
-        history = [
-            {"date": (datetime.now() - timedelta(days=i)).strftime("%Y-%m-%d")}
-            for i in range(7)
-        ]
-
-        # Create and run the crew for weekly report
-        weekly_crew = Crew(
-            agents=[progress_reporter, coordinator],
-            tasks=[create_progress_report_task(progress_reporter, history, integrated_schedule)],
-            verbose=True,
-            process=Process.sequential
+def run_integration(team, meal_plan, workout_plan, mindfulness_plan):
+    """Run the crew for schedule integration and return its output"""
+    integration_crew = Crew(
+        agents=[team["coordinator"], team["nutritionist"], team["fitness_planner"], team["mindfulness_guide"]],
+        tasks=[create_integrated_schedule_task(team["coordinator"], meal_plan, workout_plan, mindfulness_plan)],
+        **crew_options(),
+        process=Process.sequential
+    )
+    with metrics.stage("integration"):
+        return integration_crew.kickoff()
+
+def run_local_integration(plans, narrative=False, usage=None):
+    """Integrate structured plans with the local scheduler and return the schedule as markdown
+
+    The narrative call's token usage is added to usage, a RunUsage, when given.
+    """
+    # Overlaps and spacing are resolved locally; the LLM at most writes the
+    # narrative, and is never asked to rearrange times
+    with metrics.stage("integration", role="scheduler"):
+        schedule = build_schedule(
+            {
+                "meal": plans["meal_plan"]["entries"],
+                "workout": plans["workout_plan"]["entries"],
+                "mindfulness": plans["mindfulness_plan"]["entries"]
+            },
+            meal_workout_gap=MEAL_WORKOUT_GAP_MINUTES,
+            buffer=ACTIVITY_BUFFER_MINUTES
         )
+    timetable = schedule.to_markdown()
+    if not narrative:
+        return timetable
+    model = model_router.model("schedule_narrative")
+    with metrics.stage("schedule_narrative", role="Schedule Coordinator"), model_router.timed("schedule_narrative", model):
+        response = shared_llm(model).invoke(schedule_narrative_prompt(schedule))
+    if usage is not None:
+        usage.add_message(response)
+    return f"{response.content}\n\n{timetable}"
+
+def run_weekly_report(team, history, integrated_schedule):
+    """Run the crew for the weekly report and return its output"""
+    weekly_crew = Crew(
+        agents=[team["progress_reporter"], team["coordinator"]],
+        tasks=[create_progress_report_task(team["progress_reporter"], history, integrated_schedule)],
+        **crew_options(),
+        process=Process.sequential
+    )
+    with metrics.stage("weekly_report"):
+        return weekly_crew.kickoff()
+
+# -- Stage Graph --
+
+# Planning stage -> (agent that owns it, task builder)
+PLAN_TASKS = {
+    "meal_plan": ("nutritionist", create_meal_plan_task),
+    "workout_plan": ("fitness_planner", create_workout_plan_task),
+    "mindfulness_plan": ("mindfulness_guide", create_mindfulness_plan_task)
+}
+
+def run_plan_stage(team, stage, user_input, structured=None):
+    """Run one planning task as its own crew, with the other planners as coworkers"""
+    if structured is None:
+        structured = STRUCTURED_PLANS or LOCAL_SCHEDULER
+    owner, build_task = PLAN_TASKS[stage]
+    agent = team[owner]
+    # Coworkers are copied, as in crew_runner.kickoff, because the other
+    # planning stages may be running on those agents in other threads
+    coworkers = [team[name].model_copy() for name, _ in PLAN_TASKS.values() if name != owner]
+    crew = Crew(
+        agents=[agent] + coworkers,
+        tasks=[build_task(agent, user_input, structured)],
+        **crew_options(),
+        process=Process.sequential
+    )
+    with metrics.stage(stage):
+        return crew.kickoff()
+
+def plan_stage_output(crew_output):
+    """Return a planning stage's result as plain data: display text, handoff text and structured plan"""
+    task_output = crew_output.tasks_output[0]
+    display, handoff = stage_text(task_output)
+    plan = getattr(task_output, "pydantic", None)
+    return {
+        "display": display,
+        "handoff": handoff,
+        "structured": plan.model_dump() if isinstance(plan, StagePlan) else None
+    }
+
+def planning_stage(stage):
+    def run(context, inputs, upstream):
+        output = run_plan_stage(context["team"], stage, inputs)
+        context["usage"].add_crew_output(output)
+        return plan_stage_output(output)
+    return run
+
+def integration_stage(context, inputs, upstream):
+    plans = {stage: upstream[stage]["structured"] for stage in PLAN_STAGES}
+    if LOCAL_SCHEDULER and all(plans.values()):
+        return run_local_integration(plans, narrative=SCHEDULE_NARRATIVE, usage=context["usage"])
+    output = run_integration(context["team"], *(upstream[stage]["handoff"] for stage in PLAN_STAGES))
+    context["usage"].add_crew_output(output)
+    return output.raw
+
+def weekly_report_stage(context, inputs, upstream):
+    output = run_weekly_report(context["team"], inputs["history"], upstream["integrated_schedule"])
+    context["usage"].add_crew_output(output)
+    return output.raw
+
+# Each stage names the profile fields its task reads, so a profile change
+# only reruns the stages that read a changed field and those downstream.
+# Stages run with context {"team": ..., "usage": RunUsage}
+PLAN_PIPELINE = Pipeline([
+    Stage("meal_plan", planning_stage("meal_plan"), inputs=["goals", "preferences"]),
+    Stage("workout_plan", planning_stage("workout_plan"), inputs=["fitness_level", "available_equipment"]),
+    Stage("mindfulness_plan", planning_stage("mindfulness_plan"), inputs=["mood"]),
+    Stage("integrated_schedule", integration_stage, after=PLAN_STAGES),
+    Stage("weekly_report", weekly_report_stage, inputs=["history"], after=["integrated_schedule"])
+])
+
+def plan_results(outputs):
+    """Flatten PLAN_PIPELINE outputs, all or those finished so far, into the stage keys the apps and plan store use"""
+    planned = [stage for stage in PLAN_STAGES if stage in outputs]
+    results = {stage: outputs[stage]["display"] for stage in planned}
+    if planned:
+        results["handoff"] = {stage: outputs[stage]["handoff"] for stage in planned}
+    plans = {stage: outputs[stage]["structured"] for stage in planned}
+    if len(planned) == len(PLAN_STAGES) and all(plans.values()):
+        results["structured"] = plans
+    for stage in ("integrated_schedule", "weekly_report"):
+        if stage in outputs:
+            results[stage] = outputs[stage]
+    return results
+
+def stage_outputs(results):
+    """Return the PLAN_PIPELINE outputs that stored results already hold, the inverse of plan_results"""
+    outputs = {}
+    handoff = results.get("handoff", {})
+    plans = results.get("structured", {})
+    for stage in PLAN_STAGES:
+        if stage in results:
+            outputs[stage] = {
+                "display": results[stage],
+                "handoff": handoff.get(stage, results[stage]),
+                "structured": plans.get(stage)
+            }
+    for stage in ("integrated_schedule", "weekly_report"):
+        if stage in results:
+            outputs[stage] = results[stage]
+    return outputs
+
+def run_health_coach(user_profile, parallel=None, registry=None, user_id=DEFAULT_USER_ID, memo=None):
+    """Run PLAN_PIPELINE for a profile and the user's logs and return the results the apps store
+
+    Pass the same ``memo`` dict across calls to reuse the stages whose
+    inputs did not change.
+    """
+    if parallel is None:
+        parallel = PARALLEL_PLANNING
+    if registry is None:
+        registry = agent_registry
+    if memo is None:
+        memo = {}
+    usage = RunUsage()
+    titles = {
+        "meal_plan": "Meal Plan",
+        "workout_plan": "Workout Plan",
+        "mindfulness_plan": "Mindfulness Plan",
+        "integrated_schedule": "Integrated Schedule",
+        "weekly_report": "Weekly Report"
+    }
+
+    def done(stage, output):
+        show_output(titles[stage], output["display"] if stage in PLAN_STAGES else output)
+
+    try:
+        # The user's weekly rollups and streaks
+        history = load_history(user_id)
+        # Lease agents from the registry and count every coworker call made
+        # during this run against one budget
+        with registry.lease() as team, activate(create_delegation_budget(usage)):
+            outputs = PLAN_PIPELINE.run(
+                dict(user_profile, history=history), memo,
+                context={"team": team, "usage": usage}, parallel=parallel, done=done
+            )
+
+        show_output("Run Usage", usage.as_dict())
+        metrics.export_if_configured()
 
-        # Get weekly report
-        weekly_report = weekly_crew.kickoff()
-        print("\n--- Weekly Report ---")
-        print(weekly_report)
+        # Same stage keys the Streamlit app stores, so results can be cached
+        results = plan_results(outputs)
+        results["history_key"] = profile_key({"history": history})
+        results["usage"] = usage.as_dict()
+        return results
 
     except Exception as e:
-        print(f"Error in workflow: {str(e)}")
+        if VERBOSE:
+            print(f"Error in workflow: {str(e)}")
+            print(f"Usage before failure: {usage.as_dict()}")
+        else:
+            get_logger("pipeline").exception("Error in workflow", extra={"usage": usage.as_dict()})
+        metrics.export_if_configured()
         raise
 
 if __name__ == "__main__":
-    # Validate required fields in user profile
-    required_fields = ["goals", "preferences", "fitness_level", "available_equipment", "mood"]
     user_profile = {
         "goals": {"lose_weight": True, "gain_muscle": False},
         "preferences": {"diet": "balanced", "exclude": ["nuts"]},
@@ -298,8 +570,6 @@ if __name__ == "__main__":
     }
     
     # Check if all required fields are present
-    missing_fields = [field for field in required_fields if field not in user_profile]
-    if missing_fields:
-        raise ValueError(f"Missing required fields in user profile: {missing_fields}")
+    validate_profile(user_profile)
     
     run_health_coach(user_profile)
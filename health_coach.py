@@ -1,21 +1,38 @@
-from crewai import Agent, Task, Crew, Process
+from crewai import Agent, Task
 from langchain.tools import tool
 from dotenv import load_dotenv
+import metrics
+from crew_runner import kickoff
+from llm_clients import get_llm
+from log_sink import show_output
+from model_router import model_router
+from settings import PARALLEL_PLANNING, VERBOSE
 import os
 
 # Load environment variables
 load_dotenv()
 
 class HealthCoach:
-    def __init__(self):
-        # Initialize agents
+    # Fields run_health_coach reads from a user profile
+    REQUIRED_FIELDS = [
+        'goals', 'dietary_restrictions', 'fitness_level', 'equipment',
+        'stress_level', 'time_availability', 'weekly_activities', 'achievements'
+    ]
+
+    def __init__(self, parallel=None):
+        # None to follow the PARALLEL_PLANNING setting
+        self.parallel = PARALLEL_PLANNING if parallel is None else parallel
+
+        # Initialize agents on the shared, rate-limited and instrumented
+        # client, each on the model its role is routed to
         self.nutritionist = Agent(
             role='Nutritionist',
             goal='Create personalized meal plans that align with user health goals',
             backstory="""You are an experienced nutritionist with expertise in creating 
             balanced, healthy meal plans. You understand different dietary needs and 
             can adapt recommendations based on user preferences and restrictions.""",
-            verbose=True
+            verbose=VERBOSE,
+            llm=get_llm(model=model_router.role_model('Nutritionist'))
         )
 
         self.fitness_planner = Agent(
@@ -24,7 +41,8 @@ class HealthCoach:
             backstory="""You are a certified fitness trainer specializing in home workouts 
             and bodyweight exercises. You create safe, effective workout routines that 
             can be performed anywhere.""",
-            verbose=True
+            verbose=VERBOSE,
+            llm=get_llm(model=model_router.role_model('Fitness Planner'))
         )
 
         self.mindfulness_guide = Agent(
@@ -33,7 +51,8 @@ class HealthCoach:
             backstory="""You are a mindfulness expert with years of experience in 
             meditation and stress management. You help people develop healthy mental 
             habits and coping strategies.""",
-            verbose=True
+            verbose=VERBOSE,
+            llm=get_llm(model=model_router.role_model('Mindfulness Guide'))
         )
 
         self.progress_reporter = Agent(
@@ -42,7 +61,8 @@ class HealthCoach:
             backstory="""You are a health coach who specializes in tracking progress 
             and providing motivational support. You help users stay accountable and 
             celebrate their achievements.""",
-            verbose=True
+            verbose=VERBOSE,
+            llm=get_llm(model=model_router.role_model('Progress Reporter'))
         )
 
     def create_meal_plan(self, user_goals, dietary_restrictions):
@@ -116,15 +136,14 @@ class HealthCoach:
             self.generate_progress_report(user_profile['weekly_activities'], user_profile['achievements'])
         ]
 
-        # Create and run the crew
-        crew = Crew(
-            agents=[self.nutritionist, self.fitness_planner, self.mindfulness_guide, self.progress_reporter],
-            tasks=tasks,
-            verbose=True,
-            process=Process.sequential
-        )
-
-        result = crew.kickoff()
+        # Create and run the crew; none of the tasks reads another's output,
+        # so in parallel mode all four run concurrently
+        with metrics.stage("coach"):
+            result = kickoff(
+                agents=[self.nutritionist, self.fitness_planner, self.mindfulness_guide, self.progress_reporter],
+                tasks=tasks,
+                parallel=self.parallel
+            )
         return result
 
 def main():
@@ -142,8 +161,7 @@ def main():
 
     coach = HealthCoach()
     result = coach.run_health_coach(user_profile)
-    print("\nHealth Coach Recommendations:")
-    print(result)
+    show_output("Health Coach Recommendations", result)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,411 @@
+"""Daily adherence logs and the rollups that feed the weekly progress report.
+
+Every log write also updates, in the same transaction, a per-user weekly
+rollup (days logged, workout and meditation days and minutes, meals
+followed versus planned, mood counts) and the user's streaks. Building the
+report input is then a few primary-key lookups, and its size does not grow
+with the length of someone's history.
+
+Usage:
+    python history_store.py log alice --workouts 1 --workout-minutes 30 --meals 3/3 --meditation 10 --mood calm
+    python history_store.py import logs.jsonl
+    python history_store.py show alice --days 14
+    python history_store.py summary alice
+"""
+import argparse
+import json
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+try:
+    import pysqlite3 as sqlite3
+except ImportError:
+    import sqlite3
+
+DEFAULT_USER_ID = "default"
+
+# Logged fields and their defaults for a day with no value given
+LOG_FIELDS = {
+    "workouts_done": 0,
+    "workout_minutes": 0,
+    "meals_followed": 0,
+    "meals_planned": 0,
+    "meditation_minutes": 0,
+    "mood": None
+}
+
+# The (user_id, date) primary key doubles as the index for range queries
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS daily_logs (
+    user_id TEXT NOT NULL,
+    date TEXT NOT NULL,
+    workouts_done INTEGER NOT NULL DEFAULT 0,
+    workout_minutes INTEGER NOT NULL DEFAULT 0,
+    meals_followed INTEGER NOT NULL DEFAULT 0,
+    meals_planned INTEGER NOT NULL DEFAULT 0,
+    meditation_minutes INTEGER NOT NULL DEFAULT 0,
+    mood TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (user_id, date)
+) WITHOUT ROWID
+"""
+
+ROLLUP_SCHEMA = """
+CREATE TABLE IF NOT EXISTS weekly_rollups (
+    user_id TEXT NOT NULL,
+    week_start TEXT NOT NULL,
+    days_logged INTEGER NOT NULL DEFAULT 0,
+    workout_days INTEGER NOT NULL DEFAULT 0,
+    workouts_done INTEGER NOT NULL DEFAULT 0,
+    workout_minutes INTEGER NOT NULL DEFAULT 0,
+    meals_followed INTEGER NOT NULL DEFAULT 0,
+    meals_planned INTEGER NOT NULL DEFAULT 0,
+    meditation_days INTEGER NOT NULL DEFAULT 0,
+    meditation_minutes INTEGER NOT NULL DEFAULT 0,
+    moods TEXT NOT NULL DEFAULT '{}',
+    PRIMARY KEY (user_id, week_start)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS user_streaks (
+    user_id TEXT PRIMARY KEY,
+    last_date TEXT NOT NULL,
+    logging INTEGER NOT NULL,
+    workout INTEGER NOT NULL,
+    longest_logging INTEGER NOT NULL,
+    longest_workout INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+# Summed weekly rollup columns
+ROLLUP_COUNTS = [
+    "days_logged", "workout_days", "workouts_done", "workout_minutes",
+    "meals_followed", "meals_planned", "meditation_days", "meditation_minutes"
+]
+
+UPSERT = f"""
+INSERT INTO daily_logs (user_id, date, {", ".join(LOG_FIELDS)}, updated_at)
+VALUES (?, ?, {", ".join("?" for _ in LOG_FIELDS)}, ?)
+ON CONFLICT (user_id, date) DO UPDATE SET
+    {", ".join(f"{field} = excluded.{field}" for field in LOG_FIELDS)},
+    updated_at = excluded.updated_at
+"""
+
+
+def _iso(day):
+    return day.isoformat() if isinstance(day, date) else str(day)
+
+
+def week_start(day):
+    """Return the Monday of a date's week as YYYY-MM-DD"""
+    day = date.fromisoformat(_iso(day))
+    return (day - timedelta(days=day.weekday())).isoformat()
+
+
+def contribution(log):
+    """Return what one day's log adds to its weekly rollup"""
+    return {
+        "days_logged": 1,
+        "workout_days": int(log["workouts_done"] > 0),
+        "workouts_done": log["workouts_done"],
+        "workout_minutes": log["workout_minutes"],
+        "meals_followed": log["meals_followed"],
+        "meals_planned": log["meals_planned"],
+        "meditation_days": int(log["meditation_minutes"] > 0),
+        "meditation_minutes": log["meditation_minutes"]
+    }
+
+
+def streaks(days):
+    """Return (logging, workout, longest logging, longest workout) streaks over (date, workouts_done) pairs in date order
+
+    The current streaks are those running up to the last date.
+    """
+    logging = workout = longest_logging = longest_workout = 0
+    previous = None
+    for day, workouts_done in days:
+        day = date.fromisoformat(day)
+        consecutive = previous is not None and day - previous == timedelta(days=1)
+        logging = logging + 1 if consecutive else 1
+        workout = (workout + 1 if consecutive else 1) if workouts_done > 0 else 0
+        longest_logging = max(longest_logging, logging)
+        longest_workout = max(longest_workout, workout)
+        previous = day
+    return logging, workout, longest_logging, longest_workout
+
+
+class HistoryStore:
+    """SQLite store of per-user daily logs, with writes buffered into batches"""
+
+    def __init__(self, path, batch_size=100):
+        self.path = path
+        self.batch_size = batch_size
+        self._local = threading.local()
+        self._pending = []
+        self._pending_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        with self._connection() as conn:
+            # WAL lets the app read while a batch is being written
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(SCHEMA)
+            conn.executescript(ROLLUP_SCHEMA)
+            # Logs written before the rollups existed
+            if conn.execute("SELECT 1 FROM daily_logs LIMIT 1").fetchone() and \
+                    not conn.execute("SELECT 1 FROM user_streaks LIMIT 1").fetchone():
+                self._rebuild_rollups(conn)
+
+    @contextmanager
+    def _connection(self):
+        # One connection per thread; sqlite3 connections are not shared safely
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        with conn:
+            yield conn
+
+    def log(self, user_id, day, **fields):
+        """Queue one day's log, replacing any earlier log for that day; written on the next flush"""
+        unknown = set(fields) - set(LOG_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown log fields: {sorted(unknown)}")
+        row = (user_id, _iso(day)) + tuple(fields.get(field, default) for field, default in LOG_FIELDS.items())
+        with self._pending_lock:
+            self._pending.append(row + (time.time(),))
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self.flush()
+
+    def flush(self):
+        """Write every queued log in one transaction"""
+        # Flushes are serialized so a later log of a day is never overwritten
+        # by an earlier batch that committed after it
+        with self._flush_lock:
+            with self._pending_lock:
+                rows, self._pending = self._pending, []
+            if not rows:
+                return 0
+            try:
+                with self._connection() as conn:
+                    # Take the write lock up front: rollups are read, then updated
+                    conn.execute("BEGIN IMMEDIATE")
+                    for row in rows:
+                        self._write(conn, row)
+            except Exception:
+                with self._pending_lock:
+                    self._pending[:0] = rows
+                raise
+            return len(rows)
+
+    def _write(self, conn, row):
+        """Upsert one log and move the rollups from its old values, if any, to its new ones"""
+        user_id, day = row[0], row[1]
+        new = dict(zip(LOG_FIELDS, row[2:-1]))
+        old = conn.execute(
+            f"SELECT {', '.join(LOG_FIELDS)} FROM daily_logs WHERE user_id = ? AND date = ?", (user_id, day)
+        ).fetchone()
+        conn.execute(UPSERT, row)
+        if old is not None:
+            self._add_to_week(conn, user_id, day, dict(zip(LOG_FIELDS, old)), sign=-1)
+        self._add_to_week(conn, user_id, day, new, sign=1)
+        self._update_streaks(conn, user_id, day, new["workouts_done"])
+
+    def _add_to_week(self, conn, user_id, day, log, sign):
+        week = week_start(day)
+        row = conn.execute(
+            f"SELECT {', '.join(ROLLUP_COUNTS)}, moods FROM weekly_rollups WHERE user_id = ? AND week_start = ?",
+            (user_id, week)
+        ).fetchone()
+        counts = dict(zip(ROLLUP_COUNTS, row[:-1])) if row else dict.fromkeys(ROLLUP_COUNTS, 0)
+        moods = json.loads(row[-1]) if row else {}
+        for name, value in contribution(log).items():
+            counts[name] += sign * value
+        if log["mood"]:
+            moods[log["mood"]] = moods.get(log["mood"], 0) + sign
+            if moods[log["mood"]] <= 0:
+                del moods[log["mood"]]
+        conn.execute(
+            f"INSERT OR REPLACE INTO weekly_rollups (user_id, week_start, {', '.join(ROLLUP_COUNTS)}, moods) "
+            f"VALUES (?, ?, {', '.join('?' for _ in ROLLUP_COUNTS)}, ?)",
+            (user_id, week) + tuple(counts[name] for name in ROLLUP_COUNTS) + (json.dumps(moods, sort_keys=True),)
+        )
+
+    def _update_streaks(self, conn, user_id, day, workouts_done):
+        row = conn.execute(
+            "SELECT last_date, logging, workout, longest_logging, longest_workout FROM user_streaks WHERE user_id = ?",
+            (user_id,)
+        ).fetchone()
+        if row is not None and day <= row[0]:
+            # An edit or backfill can join or split streaks anywhere, so the
+            # rare out-of-order write recounts this user's days
+            days = conn.execute(
+                "SELECT date, workouts_done FROM daily_logs WHERE user_id = ? ORDER BY date", (user_id,)
+            ).fetchall()
+            values = (days[-1][0],) + streaks(days)
+        else:
+            # The common case, a new latest day, extends or restarts the streaks
+            last_date, logging, workout, longest_logging, longest_workout = row or (None, 0, 0, 0, 0)
+            consecutive = last_date is not None and \
+                date.fromisoformat(day) - date.fromisoformat(last_date) == timedelta(days=1)
+            logging = logging + 1 if consecutive else 1
+            workout = (workout + 1 if consecutive else 1) if workouts_done > 0 else 0
+            values = (day, logging, workout, max(longest_logging, logging), max(longest_workout, workout))
+        conn.execute(
+            "INSERT OR REPLACE INTO user_streaks "
+            "(user_id, last_date, logging, workout, longest_logging, longest_workout) VALUES (?, ?, ?, ?, ?, ?)",
+            (user_id,) + values
+        )
+
+    def _rebuild_rollups(self, conn):
+        """Recompute every rollup from the logs"""
+        conn.execute("DELETE FROM weekly_rollups")
+        conn.execute("DELETE FROM user_streaks")
+        logs = conn.execute(
+            f"SELECT user_id, date, {', '.join(LOG_FIELDS)} FROM daily_logs ORDER BY user_id, date"
+        ).fetchall()
+        for log in logs:
+            self._add_to_week(conn, log[0], log[1], dict(zip(LOG_FIELDS, log[2:])), sign=1)
+            self._update_streaks(conn, log[0], log[1], log[2])
+
+    def summary(self, user_id, today=None):
+        """Return the fixed-size progress report input: this and last week's rollups and the streaks"""
+        # Reads see every log queued before them
+        self.flush()
+        today = today or date.today()
+        this_week = week_start(today)
+        last_week = week_start(date.fromisoformat(this_week) - timedelta(days=7))
+        with self._connection() as conn:
+            weeks = {
+                week: conn.execute(
+                    f"SELECT {', '.join(ROLLUP_COUNTS)}, moods FROM weekly_rollups "
+                    "WHERE user_id = ? AND week_start = ?",
+                    (user_id, week)
+                ).fetchone()
+                for week in (this_week, last_week)
+            }
+            streak = conn.execute(
+                "SELECT last_date, logging, workout, longest_logging, longest_workout FROM user_streaks WHERE user_id = ?",
+                (user_id,)
+            ).fetchone()
+
+        def describe(week, row):
+            if row is None:
+                return {"week_start": week, "days_logged": 0}
+            counts = dict(zip(ROLLUP_COUNTS, row[:-1]))
+            planned = counts["meals_planned"]
+            return {
+                "week_start": week,
+                **counts,
+                "meal_adherence": round(counts["meals_followed"] / planned, 2) if planned else None,
+                "mood_distribution": json.loads(row[-1])
+            }
+
+        # A streak whose last day is before yesterday has been broken
+        active = streak is not None and date.fromisoformat(streak[0]) >= today - timedelta(days=1)
+        return {
+            "as_of": today.isoformat(),
+            "this_week": describe(this_week, weeks[this_week]),
+            "last_week": describe(last_week, weeks[last_week]),
+            "streaks": {
+                "last_logged": streak[0] if streak else None,
+                "logging_days": streak[1] if active else 0,
+                "workout_days": streak[2] if active else 0,
+                "longest_logging_days": streak[3] if streak else 0,
+                "longest_workout_days": streak[4] if streak else 0
+            }
+        }
+
+    def range(self, user_id, start, end):
+        """Return a user's logs from start to end inclusive, oldest first"""
+        # Reads see every log queued before them
+        self.flush()
+        with self._connection() as conn:
+            rows = conn.execute(
+                f"SELECT date, {', '.join(LOG_FIELDS)} FROM daily_logs "
+                "WHERE user_id = ? AND date BETWEEN ? AND ? ORDER BY date",
+                (user_id, _iso(start), _iso(end))
+            ).fetchall()
+        return [dict(zip(["date"] + list(LOG_FIELDS), row)) for row in rows]
+
+    def recent(self, user_id, days=7, today=None):
+        """Return a user's logs for the last ``days`` days, ending today"""
+        today = today or date.today()
+        return self.range(user_id, today - timedelta(days=days - 1), today)
+
+    def users(self):
+        self.flush()
+        with self._connection() as conn:
+            return [row[0] for row in conn.execute("SELECT DISTINCT user_id FROM daily_logs")]
+
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+def get_history_store(path=None):
+    """Return the process-wide store for a path (HISTORY_STORE_PATH by default)"""
+    if path is None:
+        from settings import HISTORY_STORE_PATH
+        path = HISTORY_STORE_PATH
+    with _shared_lock:
+        if path not in _shared:
+            _shared[path] = HistoryStore(path)
+        return _shared[path]
+
+
+def main():
+    from settings import HISTORY_STORE_PATH
+
+    parser = argparse.ArgumentParser(description="Record and inspect daily adherence logs")
+    parser.add_argument("--db", default=HISTORY_STORE_PATH, help="SQLite history file")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    log = commands.add_parser("log", help="Log one day for a user")
+    log.add_argument("user_id")
+    log.add_argument("--date", default=date.today().isoformat(), help="YYYY-MM-DD (default today)")
+    log.add_argument("--workouts", type=int, default=0, help="Workouts done")
+    log.add_argument("--workout-minutes", type=int, default=0)
+    log.add_argument("--meals", default="0/0", help="Meals followed/planned, e.g. 3/4")
+    log.add_argument("--meditation", type=int, default=0, help="Meditation minutes")
+    log.add_argument("--mood")
+
+    bulk = commands.add_parser("import", help="Import a JSONL file of logs with user_id, date and log fields")
+    bulk.add_argument("path")
+
+    show = commands.add_parser("show", help="Print a user's recent logs")
+    show.add_argument("user_id")
+    show.add_argument("--days", type=int, default=7)
+
+    summary = commands.add_parser("summary", help="Print a user's weekly rollups and streaks")
+    summary.add_argument("user_id")
+
+    args = parser.parse_args()
+    store = HistoryStore(args.db)
+
+    if args.command == "log":
+        followed, planned = (int(part) for part in args.meals.split("/"))
+        store.log(
+            args.user_id, args.date, workouts_done=args.workouts, workout_minutes=args.workout_minutes,
+            meals_followed=followed, meals_planned=planned, meditation_minutes=args.meditation, mood=args.mood
+        )
+        store.flush()
+    elif args.command == "import":
+        count = 0
+        with open(args.path) as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    store.log(record.pop("user_id"), record.pop("date"), **record)
+                    count += 1
+        store.flush()
+        print(f"Imported {count} logs")
+    elif args.command == "summary":
+        print(json.dumps(store.summary(args.user_id), indent=2))
+    else:
+        for entry in store.recent(args.user_id, days=args.days):
+            print(json.dumps(entry))
+
+
+if __name__ == "__main__":
+    main()
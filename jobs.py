@@ -0,0 +1,156 @@
+"""Bounded background job queue for plan generation.
+
+Work is submitted with a key and runs on a fixed pool of worker threads,
+so how many plans are generated at once no longer depends on how many
+browser tabs are open, and a closed or refreshed tab does not cancel the
+work. ``submit`` returns a job ID right away; submitting a key that is
+already queued or running returns the existing job instead of starting a
+second one. Jobs publish each stage's output as it finishes, so callers
+polling ``status`` can show partial results. Finished jobs are kept for a
+while so a reloaded page can pick up the result.
+
+Usage:
+    queue = JobQueue(workers=4, max_pending=32)
+    job_id = queue.submit(key, lambda job: generate(job))
+    queue.status(job_id)  # {"state": "running", "outputs": {...}, ...}
+"""
+import contextvars
+import queue
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class QueueFull(RuntimeError):
+    """Raised when the job queue already holds max_pending jobs"""
+
+
+class Job:
+    """One unit of background work and what it has produced so far"""
+
+    def __init__(self, key, run, meta=None):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.run = run
+        self.meta = dict(meta or {})
+        self.state = QUEUED
+        self.running_stages = []
+        self.outputs = {}
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def running(self, stages):
+        """Mark stages as in progress for the duration of the block; usable as a Pipeline progress callback"""
+        with self._lock:
+            self.running_stages = list(stages)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.running_stages = []
+
+    def stage_done(self, stage, output):
+        """Publish a finished stage's output to pollers"""
+        with self._lock:
+            self.outputs[stage] = output
+
+    def status(self):
+        """Return a consistent copy of the job's state"""
+        with self._lock:
+            return {
+                "id": self.id,
+                "key": self.key,
+                "state": self.state,
+                "meta": dict(self.meta),
+                "running_stages": list(self.running_stages),
+                "outputs": dict(self.outputs),
+                "result": self.result,
+                "error": self.error,
+                "created": self.created,
+                "started": self.started,
+                "finished": self.finished
+            }
+
+
+class JobQueue:
+    """Fixed pool of worker threads fed by a bounded queue, with jobs deduplicated by key"""
+
+    def __init__(self, workers=4, max_pending=32, retention=3600):
+        self.max_pending = max_pending
+        self.retention = retention
+        self._queue = queue.Queue()
+        self._jobs = {}
+        self._active = {}
+        self._lock = threading.Lock()
+        self._threads = [
+            threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, key, run, meta=None):
+        """Queue ``run(job)`` and return its job ID, or the ID of the unfinished job already holding key"""
+        with self._lock:
+            self._expire()
+            active = self._active.get(key)
+            if active is not None:
+                return active.id
+            pending = sum(1 for job in self._active.values() if job.state == QUEUED)
+            if pending >= self.max_pending:
+                raise QueueFull(f"{pending} jobs are already waiting; try again shortly")
+            job = Job(key, run, meta)
+            self._jobs[job.id] = job
+            self._active[key] = job
+        # The job runs with the submitter's context variables, as a direct call would
+        self._queue.put((job, contextvars.copy_context()))
+        return job.id
+
+    def status(self, job_id):
+        """Return a job's state, outputs so far and result or error, or None if it is unknown or expired"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        return job.status() if job is not None else None
+
+    def stats(self):
+        with self._lock:
+            states = [job.state for job in self._jobs.values()]
+        return {state: states.count(state) for state in (QUEUED, RUNNING, DONE, FAILED)}
+
+    def _expire(self):
+        cutoff = time.time() - self.retention
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.finished and job.finished < cutoff]:
+            del self._jobs[job_id]
+
+    def _work(self):
+        while True:
+            job, context = self._queue.get()
+            with job._lock:
+                job.state = RUNNING
+                job.started = time.time()
+            try:
+                result = context.run(job.run, job)
+            except Exception as e:
+                with job._lock:
+                    job.state, job.error = FAILED, str(e)
+            else:
+                with job._lock:
+                    job.state, job.result = DONE, result
+            finally:
+                with job._lock:
+                    job.finished = time.time()
+                with self._lock:
+                    if self._active.get(job.key) is job:
+                        del self._active[job.key]
+                self._queue.task_done()
@@ -0,0 +1,150 @@
+import os
+import threading
+from settings import (
+    LLM_CONNECT_TIMEOUT, LLM_KEEPALIVE_EXPIRY, LLM_MAX_CONNECTIONS, LLM_MAX_KEEPALIVE_CONNECTIONS,
+    LLM_MAX_RETRIES, LLM_POOL_TIMEOUT, LLM_READ_TIMEOUT, PREWARM_LLM_CONNECTION, RATE_LIMIT_RPM, RATE_LIMIT_TPM
+)
+
+# Clients are built on first use and shared by every caller in the process,
+# so importing this module stays cheap and all requests reuse one pool of
+# keep-alive connections to the API
+_lock = threading.RLock()
+_http_client = None
+_pool_transport = None
+_rate_limiter = None
+_openai_client = None
+_llms = {}
+_prewarm_started = False
+
+
+def api_base_url():
+    """Return the OpenAI-compatible API base URL in use"""
+    return os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1").rstrip("/")
+
+
+def get_rate_limiter():
+    """Return the process-wide limiter every OpenAI call waits on"""
+    global _rate_limiter
+    if _rate_limiter is None:
+        with _lock:
+            if _rate_limiter is None:
+                from rate_limit import RateLimiter
+                _rate_limiter = RateLimiter(RATE_LIMIT_RPM, RATE_LIMIT_TPM)
+    return _rate_limiter
+
+
+def get_http_client():
+    """Return the process-wide pooled HTTP client
+
+    The client is safe to share between threads; concurrent requests each
+    take a connection from the pool, up to LLM_MAX_CONNECTIONS, and wait up
+    to LLM_POOL_TIMEOUT for one beyond that.
+    """
+    global _http_client, _pool_transport
+    if _http_client is None:
+        with _lock:
+            if _http_client is None:
+                import httpx
+                from metrics import InstrumentedTransport, PoolStatsTransport
+                from rate_limit import RateLimitedTransport
+                _pool_transport = PoolStatsTransport(
+                    httpx.HTTPTransport(
+                        limits=httpx.Limits(
+                            max_connections=LLM_MAX_CONNECTIONS,
+                            max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+                            keepalive_expiry=LLM_KEEPALIVE_EXPIRY
+                        )
+                    ),
+                    LLM_MAX_CONNECTIONS
+                )
+                # Requests are measured, throttled and retried here, below both
+                # the OpenAI SDK and LangChain, so every call shares one budget
+                transport = InstrumentedTransport(RateLimitedTransport(
+                    _pool_transport,
+                    get_rate_limiter(),
+                    max_retries=LLM_MAX_RETRIES
+                ))
+                _http_client = httpx.Client(
+                    transport=transport,
+                    timeout=httpx.Timeout(LLM_READ_TIMEOUT, connect=LLM_CONNECT_TIMEOUT, pool=LLM_POOL_TIMEOUT)
+                )
+    return _http_client
+
+
+def pool_stats():
+    """Return the shared connection pool's usage and saturation counters, or None before it is built"""
+    transport = _pool_transport
+    return transport.stats() if transport is not None else None
+
+
+def get_openai_client():
+    """Return the process-wide OpenAI client"""
+    global _openai_client
+    if _openai_client is None:
+        with _lock:
+            if _openai_client is None:
+                import openai
+                _openai_client = openai.OpenAI(
+                    api_key=os.getenv("OPENAI_API_KEY"),
+                    http_client=get_http_client(),
+                    # Retries happen in the shared transport
+                    max_retries=0
+                )
+    return _openai_client
+
+
+def get_llm(model="gpt-4o", temperature=0.7):
+    """Return the shared LangChain chat model for a model and temperature"""
+    key = (model, temperature)
+    if key not in _llms:
+        with _lock:
+            if key not in _llms:
+                from langchain_openai import ChatOpenAI
+                _llms[key] = ChatOpenAI(
+                    model=model,
+                    temperature=temperature,
+                    http_client=get_http_client(),
+                    max_retries=0
+                )
+                use_shared_client_for_litellm()
+    return _llms[key]
+
+
+def use_shared_client_for_litellm():
+    """Route litellm's OpenAI calls through the shared client, when litellm is installed"""
+    # Newer crewai releases hand agents' LLMs to litellm instead of calling
+    # the LangChain model directly
+    try:
+        import litellm
+    except ImportError:
+        return
+    litellm.client_session = get_http_client()
+    litellm.num_retries = 0
+
+
+def prewarm(background=True):
+    """Open the TLS connection to the API before the first real request"""
+    global _prewarm_started
+    with _lock:
+        if _prewarm_started:
+            return
+        _prewarm_started = True
+
+    def warm():
+        try:
+            # Any response will do; the point is the connection left in the pool
+            get_http_client().head(api_base_url() + "/models")
+        except Exception as e:
+            from log_sink import get_logger
+            get_logger("llm_clients").warning(f"Connection pre-warm failed: {str(e)}")
+
+    if background:
+        threading.Thread(target=warm, name="llm-prewarm", daemon=True).start()
+    else:
+        warm()
+
+
+def prewarm_if_enabled():
+    """Pre-warm the API connection in the background when PREWARM_LLM_CONNECTION is set"""
+    if PREWARM_LLM_CONNECTION:
+        prewarm(background=True)
@@ -0,0 +1,178 @@
+"""Output routing for verbose (debugging) and quiet (production) runs.
+
+In verbose mode agents and crews print their full reasoning and pipeline
+outputs are printed, as during development. In quiet mode nothing is
+printed: agent steps, task results and pipeline outputs become structured
+log records that are put on a bounded in-memory queue without blocking, and
+a single background thread writes them out as JSON lines. Records below
+WARNING can be sampled, and when the queue is full new records are dropped
+and counted rather than making the caller wait.
+"""
+import atexit
+import json
+import logging
+import queue
+import random
+import sys
+import threading
+from logging.handlers import QueueHandler, QueueListener
+
+from settings import LOG_FILE, LOG_LEVEL, LOG_QUEUE_SIZE, LOG_SAMPLE_RATE, VERBOSE
+
+LOGGER_NAME = "healthcoach"
+
+# Longest text kept from an agent step or output in a log record
+MAX_TEXT_CHARS = 2000
+
+# Attributes every LogRecord has; anything else was passed in ``extra``
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+_lock = threading.Lock()
+_handler = None
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats a record as one JSON object per line, including its extra fields"""
+
+    def format(self, record):
+        entry = {
+            "time": record.created,
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": record.getMessage()
+        }
+        entry.update({key: value for key, value in vars(record).items() if key not in _RECORD_ATTRS})
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps every WARNING and above, and a fraction of lower records"""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno >= logging.WARNING or self.rate >= 1 or random.random() < self.rate
+
+
+class BoundedQueueHandler(QueueHandler):
+    """QueueHandler that drops records when its queue is full instead of blocking or erroring"""
+
+    def __init__(self, maxsize):
+        super().__init__(queue.Queue(maxsize))
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+
+
+class DrainingQueueListener(QueueListener):
+    """QueueListener whose stop waits for room in a full queue rather than failing"""
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+
+def configure():
+    """Route the process's log records through the bounded queue, once"""
+    global _handler, _listener
+    with _lock:
+        if _handler is not None:
+            return
+        target = logging.FileHandler(LOG_FILE) if LOG_FILE else logging.StreamHandler(sys.stderr)
+        target.setFormatter(JsonFormatter())
+        _handler = BoundedQueueHandler(LOG_QUEUE_SIZE)
+        _handler.addFilter(SamplingFilter(LOG_SAMPLE_RATE))
+        _listener = DrainingQueueListener(_handler.queue, target, respect_handler_level=False)
+        _listener.start()
+
+        # The root logger also carries crewai's, LangChain's and httpx's records
+        root = logging.getLogger()
+        root.addHandler(_handler)
+        root.setLevel(LOG_LEVEL)
+        atexit.register(shutdown)
+
+
+def shutdown():
+    """Flush the queued records and report how many were dropped"""
+    global _listener
+    with _lock:
+        listener, _listener = _listener, None
+    if listener is None:
+        return
+    listener.stop()
+    if _handler.dropped:
+        for target in listener.handlers:
+            target.handle(logging.makeLogRecord({
+                "name": LOGGER_NAME, "levelno": logging.WARNING, "levelname": "WARNING",
+                "msg": "Log queue was full; records dropped", "dropped": _handler.dropped
+            }))
+
+
+def get_logger(name=None):
+    """Return a logger under the app's namespace, configuring the sink in quiet mode"""
+    if not VERBOSE:
+        configure()
+    return logging.getLogger(f"{LOGGER_NAME}.{name}" if name else LOGGER_NAME)
+
+
+def _truncate(text):
+    text = str(text)
+    return text if len(text) <= MAX_TEXT_CHARS else text[:MAX_TEXT_CHARS] + "..."
+
+
+def log_agent_step(step):
+    """Crew step_callback: log each agent action or final answer"""
+    logger = get_logger("agent")
+    # Depending on the crewai version a step is an action, a final answer,
+    # or a list of (action, observation) pairs
+    for item in step if isinstance(step, list) else [step]:
+        action, observation = item if isinstance(item, tuple) else (item, None)
+        logger.debug(
+            "agent step",
+            extra={
+                "step": type(action).__name__,
+                "tool": getattr(action, "tool", None),
+                "text": _truncate(getattr(action, "log", None) or getattr(action, "output", None) or action),
+                "observation": _truncate(observation) if observation is not None else None
+            }
+        )
+
+
+def log_task_output(task_output):
+    """Crew task_callback: log that a task finished and the size of its output"""
+    get_logger("crew").info(
+        "task finished",
+        extra={
+            "agent": getattr(task_output, "agent", None),
+            "chars": len(str(getattr(task_output, "raw", task_output)))
+        }
+    )
+
+
+def crew_options():
+    """Keyword arguments for Crew: full verbosity, or steps sent to the log queue"""
+    if VERBOSE:
+        return {"verbose": True}
+    return {"verbose": False, "step_callback": log_agent_step, "task_callback": log_task_output}
+
+
+def show_output(title, body, logger_name="pipeline"):
+    """Print a pipeline output in verbose mode; log its size, and the body at DEBUG, in quiet mode"""
+    if VERBOSE:
+        print(f"\n--- {title} ---")
+        print(body)
+        return
+    logger = get_logger(logger_name)
+    logger.info(title, extra={"chars": len(str(body))})
+    logger.debug(title, extra={"body": _truncate(body)})
@@ -0,0 +1,365 @@
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import httpx
+
+# Latency buckets in seconds, spanning cache hits to long crew stages
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+# Labels applied to LLM calls made while a stage or agent is running
+_stage = contextvars.ContextVar("metrics_stage", default="none")
+_role = contextvars.ContextVar("metrics_role", default="none")
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(label_key, extra=()):
+    pairs = list(label_key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+
+class Counter:
+    """Monotonic counter with labels"""
+
+    kind = "counter"
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        with self._lock:
+            return [f"{self.name}{_format_labels(key)} {value}" for key, value in self._values.items()]
+
+    def snapshot(self):
+        with self._lock:
+            return [{"labels": dict(key), "value": value} for key, value in self._values.items()]
+
+
+class Histogram:
+    """Cumulative-bucket histogram with labels, as Prometheus expects"""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["buckets"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def render(self):
+        lines = []
+        with self._lock:
+            for key, series in self._series.items():
+                for bound, count in zip(self.buckets, series["buckets"]):
+                    lines.append(f"{self.name}_bucket{_format_labels(key, [('le', bound)])} {count}")
+                lines.append(f"{self.name}_bucket{_format_labels(key, [('le', '+Inf')])} {series['count']}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {series['sum']}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {series['count']}")
+        return lines
+
+    def snapshot(self):
+        with self._lock:
+            return [
+                {
+                    "labels": dict(key),
+                    "count": series["count"],
+                    "sum": series["sum"],
+                    "buckets": dict(zip([str(bound) for bound in self.buckets], series["buckets"]))
+                }
+                for key, series in self._series.items()
+            ]
+
+
+class MetricsRegistry:
+    """Process-wide collection of counters and histograms"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name, help_text):
+        metric = Counter(name, help_text)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, help_text, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render_prometheus(self):
+        """Return every metric in the Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        return {metric.name: metric.snapshot() for metric in self._metrics}
+
+    def write(self, path):
+        """Write the metrics to a file: Prometheus text for .prom, JSON otherwise"""
+        if path.endswith(".prom"):
+            content = self.render_prometheus()
+        else:
+            content = json.dumps({"timestamp": time.time(), "metrics": self.snapshot()}, indent=2)
+        # Write then rename, so a scraper never reads a half-written file
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+
+registry = MetricsRegistry()
+
+STAGE_SECONDS = registry.histogram(
+    "healthcoach_stage_seconds", "Wall time of each pipeline stage"
+)
+STAGE_ERRORS = registry.counter(
+    "healthcoach_stage_errors_total", "Pipeline stages that raised"
+)
+LLM_CALL_SECONDS = registry.histogram(
+    "healthcoach_llm_call_seconds", "Wall time of each LLM HTTP call, including queue wait and retries"
+)
+LLM_QUEUE_WAIT_SECONDS = registry.histogram(
+    "healthcoach_llm_queue_wait_seconds", "Time LLM calls waited on the shared rate limiter"
+)
+LLM_CALLS = registry.counter(
+    "healthcoach_llm_calls_total", "LLM HTTP calls by response status"
+)
+LLM_TOKENS = registry.counter(
+    "healthcoach_llm_tokens_total", "Prompt and completion tokens reported by the API"
+)
+LLM_POOL_IN_FLIGHT = registry.histogram(
+    "healthcoach_llm_pool_in_flight", "Requests holding or waiting for a pooled API connection, seen by each new request",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128)
+)
+LLM_POOL_SATURATED = registry.counter(
+    "healthcoach_llm_pool_saturated_total", "Requests sent while every pooled API connection was in use"
+)
+MODEL_FALLBACKS = registry.counter(
+    "healthcoach_model_fallbacks_total", "Stages moved to a faster model tier for exceeding their latency SLO"
+)
+
+
+@contextmanager
+def stage(name, role="crew"):
+    """Time a pipeline stage and label the LLM calls made inside it"""
+    stage_token = _stage.set(name)
+    role_token = _role.set(role)
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.inc(stage=name, role=role)
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage=name, role=role)
+        _role.reset(role_token)
+        _stage.reset(stage_token)
+
+
+@contextmanager
+def labels(stage=None, role=None):
+    """Label the LLM calls made inside the block, without timing it"""
+    stage_token = _stage.set(stage) if stage is not None else None
+    role_token = _role.set(role) if role is not None else None
+    try:
+        yield
+    finally:
+        if role_token is not None:
+            _role.reset(role_token)
+        if stage_token is not None:
+            _stage.reset(stage_token)
+
+
+def agent_role(role):
+    """Label the LLM calls made inside the block with an agent role"""
+    return labels(role=role)
+
+
+def record_llm_call(model, seconds, queue_wait, status, prompt_tokens=0, completion_tokens=0):
+    """Record one LLM HTTP call under the current stage and agent role"""
+    labels = {"stage": _stage.get(), "role": _role.get(), "model": model}
+    LLM_CALL_SECONDS.observe(seconds, **labels)
+    LLM_QUEUE_WAIT_SECONDS.observe(queue_wait, **labels)
+    LLM_CALLS.inc(status=str(status), **labels)
+    if prompt_tokens:
+        LLM_TOKENS.inc(prompt_tokens, kind="prompt", **labels)
+    if completion_tokens:
+        LLM_TOKENS.inc(completion_tokens, kind="completion", **labels)
+
+
+class InstrumentedTransport(httpx.BaseTransport):
+    """HTTP transport that records wall time, queue wait, tokens and model for every call"""
+
+    def __init__(self, transport):
+        self._transport = transport
+
+    def handle_request(self, request):
+        start = time.perf_counter()
+        model = "unknown"
+        if request.method == "POST":
+            try:
+                model = json.loads(request.read() or b"{}").get("model", "unknown")
+            except ValueError:
+                pass
+        try:
+            response = self._transport.handle_request(request)
+        except Exception:
+            record_llm_call(model, time.perf_counter() - start,
+                            request.extensions.get("queue_wait", 0.0), "error")
+            raise
+
+        prompt_tokens = completion_tokens = 0
+        # Streamed responses are passed through untouched; only whole JSON
+        # bodies are read here for their usage block
+        if response.headers.get("content-type", "").startswith("application/json"):
+            try:
+                usage = json.loads(response.read()).get("usage") or {}
+                prompt_tokens = usage.get("prompt_tokens", 0)
+                completion_tokens = usage.get("completion_tokens", 0)
+            except ValueError:
+                pass
+        record_llm_call(model, time.perf_counter() - start,
+                        request.extensions.get("queue_wait", 0.0), response.status_code,
+                        prompt_tokens, completion_tokens)
+        return response
+
+    def close(self):
+        self._transport.close()
+
+
+class _ReleasingStream(httpx.SyncByteStream):
+    """Response body that runs a callback once when it is closed"""
+
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._release = release
+
+    def __iter__(self):
+        yield from self._stream
+
+    def close(self):
+        try:
+            self._stream.close()
+        finally:
+            release, self._release = self._release, None
+            if release is not None:
+                release()
+
+
+class PoolStatsTransport(httpx.BaseTransport):
+    """HTTP transport that tracks how many requests hold or wait for a pooled connection
+
+    A request occupies a slot from when it is sent until its response body
+    is closed, which for a streamed completion is the end of the stream.
+    Requests sent while every connection is taken wait in the pool, and are
+    counted as saturated.
+    """
+
+    def __init__(self, transport, max_connections):
+        self._transport = transport
+        self.max_connections = max_connections
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.requests = 0
+        self.saturated_requests = 0
+        self._saturated_seconds = 0.0
+        self._saturated_since = None
+        self._lock = threading.Lock()
+
+    def _acquire(self):
+        with self._lock:
+            saturated = self.in_flight >= self.max_connections
+            self.requests += 1
+            self.saturated_requests += saturated
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            if self.in_flight >= self.max_connections and self._saturated_since is None:
+                self._saturated_since = time.monotonic()
+            in_flight = self.in_flight
+        LLM_POOL_IN_FLIGHT.observe(in_flight)
+        if saturated:
+            LLM_POOL_SATURATED.inc()
+
+    def _release(self):
+        with self._lock:
+            self.in_flight -= 1
+            if self._saturated_since is not None and self.in_flight < self.max_connections:
+                self._saturated_seconds += time.monotonic() - self._saturated_since
+                self._saturated_since = None
+
+    def handle_request(self, request):
+        self._acquire()
+        try:
+            response = self._transport.handle_request(request)
+        except Exception:
+            self._release()
+            raise
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=_ReleasingStream(response.stream, self._release),
+            extensions=response.extensions
+        )
+
+    def stats(self):
+        """Return current and peak slots in use, open connections, and how often and how long the pool was full"""
+        with self._lock:
+            saturated_seconds = self._saturated_seconds
+            if self._saturated_since is not None:
+                saturated_seconds += time.monotonic() - self._saturated_since
+            # httpx keeps its connection pool private; report it when it is there
+            pool = getattr(self._transport, "_pool", None)
+            return {
+                "max_connections": self.max_connections,
+                "in_flight": self.in_flight,
+                "peak_in_flight": self.peak_in_flight,
+                "open_connections": len(getattr(pool, "connections", ())),
+                "requests": self.requests,
+                "saturated_requests": self.saturated_requests,
+                "saturation_rate": self.saturated_requests / self.requests if self.requests else 0.0,
+                "saturated_seconds": round(saturated_seconds, 3)
+            }
+
+    def close(self):
+        self._transport.close()
+
+
+def export_if_configured():
+    """Write the metrics to METRICS_EXPORT_PATH, when it is set"""
+    from settings import METRICS_EXPORT_PATH
+
+    if METRICS_EXPORT_PATH:
+        registry.write(METRICS_EXPORT_PATH)
@@ -0,0 +1,180 @@
+"""Per-stage model selection with latency budgets.
+
+Each stage is routed to a model tier: the planning and scheduling stages
+that need the strongest model get the large tier, while stages such as the
+mindfulness plan or the weekly report's motivational note get the fast one.
+Every stage also has a latency SLO. The router keeps a window of recent
+durations for each stage and tier, and when a stage's p95 on its current
+tier exceeds the SLO it moves that stage to the next faster tier for a
+cooldown period, after which the configured tier is tried again.
+
+Usage:
+    tier, model = model_router.route("meal_plan")
+    with model_router.timed("meal_plan", model):
+        ...  # the LLM call
+"""
+import contextvars
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import metrics
+from settings import (
+    FALLBACK_COOLDOWN_SECONDS, LATENCY_FALLBACK, LATENCY_MIN_SAMPLES, LATENCY_WINDOW,
+    MODEL_ROUTING, MODEL_TIER_FAST, MODEL_TIER_LARGE
+)
+
+# Tiers from largest to fastest; a stage falls back along this order
+TIERS = {
+    "large": MODEL_TIER_LARGE,
+    "fast": MODEL_TIER_FAST
+}
+
+
+class Route:
+    """The tier a stage runs on and the p95 latency it should stay under"""
+
+    def __init__(self, tier, slo_seconds):
+        self.tier = tier
+        self.slo_seconds = slo_seconds
+
+
+ROUTES = {
+    "meal_plan": Route("large", 30),
+    "workout_plan": Route("large", 30),
+    "mindfulness_plan": Route("fast", 15),
+    "integrated_schedule": Route("large", 45),
+    "schedule_narrative": Route("fast", 10),
+    "progress_report": Route("fast", 20)
+}
+
+# The stage each agent role runs, for routing crew agents
+ROLE_STAGES = {
+    "Nutritionist": "meal_plan",
+    "Fitness Planner": "workout_plan",
+    "Mindfulness Guide": "mindfulness_plan",
+    "Schedule Coordinator": "integrated_schedule",
+    "Progress Reporter": "progress_report"
+}
+
+# Set while a timed block runs, so coworker calls inside a stage are not
+# counted as samples of their own stages
+_timing = contextvars.ContextVar("model_router_timing", default=False)
+
+
+def p95(samples):
+    ordered = sorted(samples)
+    return ordered[math.ceil(0.95 * len(ordered)) - 1]
+
+
+class ModelRouter:
+    """Thread-safe stage-to-model routing with p95-based fallback"""
+
+    def __init__(self, routes=None, tiers=None, enabled=MODEL_ROUTING, fallback=LATENCY_FALLBACK,
+                 window=LATENCY_WINDOW, min_samples=LATENCY_MIN_SAMPLES, cooldown=FALLBACK_COOLDOWN_SECONDS):
+        self.routes = dict(ROUTES if routes is None else routes)
+        self.tiers = dict(TIERS if tiers is None else tiers)
+        self.enabled = enabled
+        self.fallback = fallback
+        self.window = window
+        self.min_samples = min_samples
+        self.cooldown = cooldown
+        self._order = list(self.tiers)
+        self._samples = {}
+        self._degraded = {}
+        self._lock = threading.Lock()
+
+    def tier(self, stage):
+        """Return the tier a stage should run on now"""
+        route = self.routes.get(stage)
+        if not self.enabled or route is None:
+            return self._order[0]
+        with self._lock:
+            degraded = self._degraded.get(stage)
+            if degraded is None:
+                return route.tier
+            tier, until = degraded
+            if time.monotonic() < until:
+                return tier
+            # Cooldown over: give the configured tier a fresh window
+            del self._degraded[stage]
+            self._samples.pop((stage, route.tier), None)
+            return route.tier
+
+    def route(self, stage):
+        """Return (tier, model) for a stage"""
+        tier = self.tier(stage)
+        return tier, self.tiers[tier]
+
+    def model(self, stage):
+        return self.route(stage)[1]
+
+    def role_model(self, role):
+        """Return the model for the stage an agent role runs"""
+        return self.model(ROLE_STAGES.get(role))
+
+    def tier_of(self, model):
+        return next((tier for tier, name in self.tiers.items() if name == model), None)
+
+    def observe(self, stage, model, seconds):
+        """Record one stage duration on a model, falling back if the stage's p95 is over its SLO"""
+        route = self.routes.get(stage)
+        tier = self.tier_of(model)
+        if route is None or tier is None:
+            return
+        with self._lock:
+            samples = self._samples.setdefault((stage, tier), deque(maxlen=self.window))
+            samples.append(seconds)
+            degraded = self._degraded.get(stage)
+            current = degraded[0] if degraded else route.tier
+            if not self.fallback or tier != current or len(samples) < self.min_samples:
+                return
+            latency = p95(samples)
+            position = self._order.index(tier)
+            if latency <= route.slo_seconds or position + 1 >= len(self._order):
+                return
+            faster = self._order[position + 1]
+            self._degraded[stage] = (faster, time.monotonic() + self.cooldown)
+            self._samples.pop((stage, faster), None)
+        metrics.MODEL_FALLBACKS.inc(stage=stage, tier=faster)
+        from log_sink import get_logger
+        get_logger("model_router").warning(
+            f"{stage} p95 {latency:.1f}s is over its {route.slo_seconds}s SLO on {tier}; "
+            f"using {faster} for {self.cooldown:.0f}s"
+        )
+
+    @contextmanager
+    def timed(self, stage, model):
+        """Time the block and record it as a sample of the stage, unless it runs inside another timed block"""
+        if _timing.get():
+            yield
+            return
+        token = _timing.set(True)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            _timing.reset(token)
+        # Only completed calls are samples; failures say nothing about latency
+        self.observe(stage, model, time.perf_counter() - start)
+
+    def stats(self):
+        """Return each stage's tier, SLO and recent p95 per tier"""
+        with self._lock:
+            samples = {key: list(values) for key, values in self._samples.items()}
+        return {
+            stage: {
+                "tier": self.tier(stage),
+                "slo_seconds": route.slo_seconds,
+                "p95_seconds": {
+                    tier: round(p95(samples[(stage, tier)]), 3)
+                    for tier in self._order if samples.get((stage, tier))
+                }
+            }
+            for stage, route in self.routes.items()
+        }
+
+
+model_router = ModelRouter()
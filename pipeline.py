@@ -0,0 +1,133 @@
+"""Plan generation as a graph of stages with memoized outputs.
+
+Each stage declares the input values it reads (profile fields, or anything
+else the caller supplies) and the stages whose outputs it consumes. A
+stage's memo key hashes its own inputs together with the keys of its
+upstream stages, so every key is known before anything runs. When part of a
+profile changes, only the stages that read it, and the stages downstream of
+them, get new keys and are recomputed; the rest are served from the memo.
+"""
+import contextvars
+import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
+
+from response_cache import canonical_profile
+
+
+class Stage:
+    """One step of a pipeline
+
+    ``run(context, inputs, upstream)`` receives the caller's context, the
+    declared input values and the outputs of the ``after`` stages, and
+    returns the stage's output.
+    """
+
+    def __init__(self, name, run, inputs=(), after=()):
+        self.name = name
+        self.run = run
+        self.inputs = tuple(inputs)
+        self.after = tuple(after)
+
+
+class Pipeline:
+    """Stages in dependency order, run with per-stage memoization"""
+
+    def __init__(self, stages):
+        self.stages = list(stages)
+        seen = set()
+        for stage in self.stages:
+            if stage.name in seen:
+                raise ValueError(f"Duplicate stage: {stage.name}")
+            missing = [name for name in stage.after if name not in seen]
+            if missing:
+                raise ValueError(f"Stage {stage.name} follows stages not declared before it: {missing}")
+            seen.add(stage.name)
+
+    def levels(self):
+        """Group the stages so each group depends only on earlier groups"""
+        level_of = {}
+        for stage in self.stages:
+            level_of[stage.name] = 1 + max((level_of[name] for name in stage.after), default=-1)
+        levels = [[] for _ in range(max(level_of.values(), default=-1) + 1)]
+        for stage in self.stages:
+            levels[level_of[stage.name]].append(stage)
+        return levels
+
+    def keys(self, values):
+        """Return each stage's memo key for the given input values"""
+        keys = {}
+        for stage in self.stages:
+            payload = json.dumps(
+                {
+                    "stage": stage.name,
+                    "inputs": {name: canonical_profile(values.get(name)) for name in stage.inputs},
+                    "after": [keys[name] for name in stage.after]
+                },
+                sort_keys=True,
+                default=str
+            )
+            keys[stage.name] = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+        return keys
+
+    def stale(self, values, memo):
+        """Return the names of the stages that have no memoized output for these values"""
+        keys = self.keys(values)
+        return [stage.name for stage in self.stages if keys[stage.name] not in memo]
+
+    def run(self, values, memo, context=None, parallel=False, progress=None, done=None):
+        """Run every stale stage and return {stage name: output}
+
+        Outputs are written to ``memo`` as each stage finishes, so a run cut
+        short resumes from the stages it completed. Stale stages in the same
+        level run concurrently when ``parallel`` is set. ``progress(names)``
+        may return a context manager wrapped around each level that runs, and
+        ``done(name, output)`` is called as each stage's output, memoized or
+        computed, becomes available.
+        """
+        keys = self.keys(values)
+        outputs = {}
+
+        def finish(stage, output):
+            outputs[stage.name] = memo[keys[stage.name]] = output
+            if done:
+                done(stage.name, output)
+
+        for level in self.levels():
+            todo = []
+            for stage in level:
+                if keys[stage.name] in memo:
+                    finish(stage, memo[keys[stage.name]])
+                else:
+                    todo.append(stage)
+            if not todo:
+                continue
+
+            def call(stage):
+                inputs = {name: values.get(name) for name in stage.inputs}
+                upstream = {name: outputs[name] for name in stage.after}
+                return stage.run(context, inputs, upstream)
+
+            with progress([stage.name for stage in todo]) if progress else nullcontext():
+                if not parallel or len(todo) < 2:
+                    for stage in todo:
+                        finish(stage, call(stage))
+                    continue
+                # Context variables such as the delegation budget follow each stage into its thread
+                with ThreadPoolExecutor(max_workers=len(todo)) as executor:
+                    futures = {
+                        executor.submit(contextvars.copy_context().run, call, stage): stage
+                        for stage in todo
+                    }
+                    error = None
+                    for future in as_completed(futures):
+                        stage = futures[future]
+                        try:
+                            finish(stage, future.result())
+                        except Exception as e:
+                            # Keep the stages that did finish before failing the run
+                            error = error or e
+                    if error is not None:
+                        raise error
+        return outputs
@@ -0,0 +1,77 @@
+import json
+from typing import List
+
+from pydantic import BaseModel, Field
+
+
+class PlanEntry(BaseModel):
+    """One timed item of a plan"""
+
+    time: str = Field(description="Start time as HH:MM in 24-hour format")
+    activity: str = Field(description="Short name, e.g. 'Breakfast' or 'Strength workout'")
+    duration_minutes: int = Field(description="How long it takes, in minutes")
+    items: List[str] = Field(default_factory=list, description="Key foods, exercises or techniques, a few words each")
+
+
+class StagePlan(BaseModel):
+    """Structured result of a planning stage"""
+
+    summary: str = Field(description="Two or three sentences of prose for the user")
+    entries: List[PlanEntry] = Field(description="The day's timed entries, in order")
+    notes: List[str] = Field(default_factory=list, description="Short notes on how the plan fits the other plans")
+
+    def compact(self):
+        """Return the plan as a few terse lines, for downstream prompts"""
+        lines = [
+            f"{entry.time} {entry.activity} ({entry.duration_minutes} min)"
+            + (f": {', '.join(entry.items)}" if entry.items else "")
+            for entry in self.entries
+        ]
+        if self.notes:
+            lines.append("Notes: " + "; ".join(self.notes))
+        return "\n".join(lines)
+
+    def to_markdown(self):
+        """Return the plan as markdown, for display"""
+        lines = [self.summary, ""]
+        for entry in self.entries:
+            line = f"- **{entry.time}** {entry.activity} ({entry.duration_minutes} min)"
+            if entry.items:
+                line += f": {', '.join(entry.items)}"
+            lines.append(line)
+        if self.notes:
+            lines.append("")
+            lines.extend(f"> {note}" for note in self.notes)
+        return "\n".join(lines)
+
+
+class MealPlan(StagePlan):
+    """A day of meals and snacks; items are foods with portions"""
+
+
+class WorkoutPlan(StagePlan):
+    """A day of workouts including warm-up and cool-down; items are exercises with sets and reps"""
+
+
+class MindfulnessPlan(StagePlan):
+    """A day of meditation and breathing sessions; items are techniques"""
+
+
+def json_instructions(model):
+    """Return expected-output text asking for a JSON object matching a plan model"""
+    return (
+        f"{model.__doc__}. Respond with only a JSON object, no prose around it, "
+        f"matching this JSON schema:\n{json.dumps(model.model_json_schema())}"
+    )
+
+
+def stage_text(task_output):
+    """Return (display, handoff) text for a planning task's output
+
+    Structured outputs are shown as markdown and handed on in compact form;
+    anything else is used as-is for both.
+    """
+    plan = getattr(task_output, "pydantic", None)
+    if isinstance(plan, StagePlan):
+        return plan.to_markdown(), plan.compact()
+    return task_output.raw, task_output.raw
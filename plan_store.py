@@ -0,0 +1,77 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import pysqlite3 as sqlite3
+except ImportError:
+    import sqlite3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS plans (
+    profile_key TEXT PRIMARY KEY,
+    profile TEXT NOT NULL,
+    results TEXT NOT NULL,
+    created_at REAL NOT NULL
+)
+"""
+
+
+class PlanStore:
+    """SQLite store of fully generated plans, keyed by profile_key"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        with self._connection() as conn:
+            # WAL lets the app keep reading while the warming CLI writes
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(SCHEMA)
+
+    @contextmanager
+    def _connection(self):
+        # One connection per thread; sqlite3 connections are not shared safely
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            self._local.conn = conn
+        with conn:
+            yield conn
+
+    def get(self, key):
+        """Return the stored results for a profile key, or None"""
+        with self._connection() as conn:
+            row = conn.execute(
+                "SELECT profile, results FROM plans WHERE profile_key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        results = json.loads(row[1])
+        results["profile"] = json.loads(row[0])
+        return results
+
+    def contains(self, key):
+        with self._connection() as conn:
+            return conn.execute(
+                "SELECT 1 FROM plans WHERE profile_key = ?", (key,)
+            ).fetchone() is not None
+
+    def put(self, key, user_profile, results):
+        """Store the results generated for a profile, replacing any older entry"""
+        stored = {name: value for name, value in results.items() if name != "profile"}
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO plans (profile_key, profile, results, created_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(user_profile), json.dumps(stored), time.time())
+            )
+
+    def profiles(self):
+        """Return (profile_key, profile) for every stored plan"""
+        with self._connection() as conn:
+            rows = conn.execute("SELECT profile_key, profile FROM plans").fetchall()
+        return [(key, json.loads(profile)) for key, profile in rows]
+
+    def __len__(self):
+        with self._connection() as conn:
+            return conn.execute("SELECT COUNT(*) FROM plans").fetchone()[0]
@@ -0,0 +1,96 @@
+import hashlib
+import itertools
+import json
+from response_cache import canonical_profile
+
+# Options offered by the sidebar in both Streamlit apps
+GOAL_OPTIONS = ["Weight Loss", "Muscle Gain", "Stress Reduction", "Better Sleep", "More Energy"]
+DEFAULT_GOALS = ["Weight Loss", "More Energy"]
+DIET_OPTIONS = ["Balanced", "Vegetarian", "Vegan", "Keto", "Mediterranean"]
+RESTRICTION_OPTIONS = ["No Nuts", "No Dairy", "No Gluten", "No Shellfish", "No Eggs"]
+FITNESS_LEVEL_OPTIONS = ["Beginner", "Intermediate", "Advanced"]
+EQUIPMENT_OPTIONS = ["Yoga Mat", "Resistance Bands", "Dumbbells", "Pull-up Bar", "None"]
+MOOD_OPTIONS = ["Very Stressed", "Stressed", "Neutral", "Calm", "Very Calm"]
+
+# Fields the crew pipeline in health_advisor reads from a user profile
+REQUIRED_PROFILE_FIELDS = ["goals", "preferences", "fitness_level", "available_equipment", "mood"]
+
+
+def build_user_profile(goals, diet, restrictions, fitness_level, equipment, mood):
+    """Build the user profile dict from the sidebar selections"""
+    return {
+        "goals": {goal.lower().replace(" ", "_"): True for goal in goals},
+        "preferences": {
+            "diet": diet.lower(),
+            "exclude": [r.lower().replace(" ", "_") for r in restrictions]
+        },
+        "fitness_level": fitness_level.lower(),
+        "available_equipment": equipment,
+        "mood": mood.lower()
+    }
+
+
+def validate_profile(user_profile, required_fields=REQUIRED_PROFILE_FIELDS):
+    """Raise ValueError if a user profile is missing any required field"""
+    missing_fields = [field for field in required_fields if field not in user_profile]
+    if missing_fields:
+        raise ValueError(f"Missing required fields in user profile: {missing_fields}")
+
+
+def profile_key(user_profile):
+    """Return a stable key that is the same for equivalent user profiles"""
+    payload = json.dumps(canonical_profile(user_profile), sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _subsets(options, max_selected):
+    """Return the option subsets of up to max_selected items, smallest first"""
+    return [
+        list(subset)
+        for size in range(max_selected + 1)
+        for subset in itertools.combinations(options, size)
+    ]
+
+
+def iter_sidebar_selections(max_selected=2):
+    """Yield sidebar selections, with each multiselect limited to max_selected options
+
+    Smaller selections come first, and the default goals lead the goal
+    choices even when they hold more than max_selected options, so
+    truncating the sequence keeps the most common profiles.
+    """
+    goal_sets = _subsets(GOAL_OPTIONS, max_selected)
+    if DEFAULT_GOALS in goal_sets:
+        goal_sets.remove(DEFAULT_GOALS)
+    goal_sets.insert(0, DEFAULT_GOALS)
+    for goals, diet, restrictions, fitness_level, equipment, mood in itertools.product(
+        goal_sets,
+        DIET_OPTIONS,
+        _subsets(RESTRICTION_OPTIONS, max_selected),
+        FITNESS_LEVEL_OPTIONS,
+        _subsets(EQUIPMENT_OPTIONS, max_selected),
+        MOOD_OPTIONS
+    ):
+        yield {
+            "goals": goals,
+            "diet": diet,
+            "restrictions": restrictions,
+            "fitness_level": fitness_level,
+            "equipment": equipment,
+            "mood": mood
+        }
+
+
+def random_sidebar_selection(rng):
+    """Return a random sidebar selection drawn with the given random.Random"""
+    def pick_some(options):
+        return [option for option in options if rng.random() < 0.3]
+
+    return {
+        "goals": pick_some(GOAL_OPTIONS),
+        "diet": rng.choice(DIET_OPTIONS),
+        "restrictions": pick_some(RESTRICTION_OPTIONS),
+        "fitness_level": rng.choice(FITNESS_LEVEL_OPTIONS),
+        "equipment": pick_some(EQUIPMENT_OPTIONS),
+        "mood": rng.choice(MOOD_OPTIONS)
+    }
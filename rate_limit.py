@@ -0,0 +1,119 @@
+import json
+import random
+import threading
+import time
+
+import httpx
+
+# Responses worth retrying: rate limited, or a transient server-side failure
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Bucket refilled continuously at a per-minute rate, holding at most one minute's worth"""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount):
+        """Seconds until the bucket holds ``amount``"""
+        amount = min(amount, self.capacity)
+        return max(0.0, (amount - self.level) / self.rate)
+
+
+class RateLimiter:
+    """Process-wide limiter on requests per minute and tokens per minute
+
+    Callers block in acquire() until both buckets have room, so bursts queue
+    up in order instead of being rejected by the API.
+    """
+
+    def __init__(self, requests_per_minute, tokens_per_minute):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self._condition = threading.Condition()
+        self._waiting = 0
+
+    def acquire(self, tokens=0):
+        """Block until a request of ``tokens`` estimated tokens may be sent; return the time waited"""
+        start = time.monotonic()
+        with self._condition:
+            self._waiting += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    self.requests.refill(now)
+                    self.tokens.refill(now)
+                    delay = max(self.requests.wait_time(1), self.tokens.wait_time(tokens))
+                    if delay <= 0:
+                        self.requests.level -= 1
+                        self.tokens.level -= min(tokens, self.tokens.capacity)
+                        return time.monotonic() - start
+                    self._condition.wait(delay)
+            finally:
+                self._waiting -= 1
+
+    def queue_depth(self):
+        """Number of callers currently waiting for capacity"""
+        with self._condition:
+            return self._waiting
+
+
+def estimate_tokens(request):
+    """Roughly estimate the tokens a chat completion request will consume"""
+    if request.method != "POST":
+        return 0
+    try:
+        body = json.loads(request.read() or b"{}")
+    except ValueError:
+        return 0
+    # About four characters per token for the prompt, plus the completion budget
+    prompt = sum(len(str(message.get("content", ""))) for message in body.get("messages", []))
+    return prompt // 4 + (body.get("max_tokens") or body.get("max_completion_tokens") or 1000)
+
+
+class RateLimitedTransport(httpx.BaseTransport):
+    """HTTP transport that waits on a RateLimiter and retries 429/5xx responses
+
+    Retries use jittered exponential backoff, or the server's Retry-After
+    header when it sends one.
+    """
+
+    def __init__(self, transport, limiter, max_retries=5, base_delay=1.0, max_delay=60.0):
+        self._transport = transport
+        self.limiter = limiter
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def backoff(self, attempt, response):
+        retry_after = response.headers.get("retry-after")
+        if retry_after:
+            try:
+                return min(self.max_delay, float(retry_after))
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def handle_request(self, request):
+        tokens = estimate_tokens(request)
+        # Total time spent waiting for capacity, for metrics further out
+        request.extensions["queue_wait"] = 0.0
+        for attempt in range(self.max_retries + 1):
+            request.extensions["queue_wait"] += self.limiter.acquire(tokens)
+            response = self._transport.handle_request(request)
+            if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                return response
+            delay = self.backoff(attempt, response)
+            response.close()
+            time.sleep(delay)
+
+    def close(self):
+        self._transport.close()
@@ -0,0 +1,81 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+def canonical_profile(user_profile):
+    """Return a copy of a user profile with dict keys and list items in a stable order"""
+    if isinstance(user_profile, dict):
+        return {key: canonical_profile(user_profile[key]) for key in sorted(user_profile)}
+    if isinstance(user_profile, (list, tuple, set)):
+        return sorted((canonical_profile(item) for item in user_profile), key=json.dumps)
+    return user_profile
+
+
+class ResponseCache:
+    """Thread-safe LRU cache of model responses with a time-to-live"""
+
+    def __init__(self, maxsize=256, ttl=3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(profile, prompt, model, temperature):
+        """Build a cache key from the canonical profile, prompt and model settings"""
+        payload = json.dumps(
+            {
+                "profile": canonical_profile(profile),
+                "prompt": prompt,
+                "model": model,
+                "temperature": temperature
+            },
+            sort_keys=True
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """Return the cached response for a key, or None on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] > self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        """Store a response, evicting the least recently used entries when full"""
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop all entries and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """Return the current size and hit/miss counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
@@ -0,0 +1,131 @@
+import contextvars
+import threading
+from contextlib import contextmanager
+
+# How deep the current task execution is nested in delegations (None outside a task)
+_depth = contextvars.ContextVar("delegation_depth", default=None)
+# Coworker calls made so far by the current top-level task
+_task_calls = contextvars.ContextVar("delegation_task_calls", default=None)
+_active_budget = contextvars.ContextVar("delegation_budget", default=None)
+
+REFUSAL = (
+    "Delegation limit reached ({reason}). Do not ask coworkers again; "
+    "complete the task with the information you already have."
+)
+
+
+def usage_dict(token_usage):
+    """Return crew token usage as a plain dict, whichever form crewai reports it in"""
+    if hasattr(token_usage, "model_dump"):
+        return token_usage.model_dump()
+    return dict(token_usage or {})
+
+
+class RunUsage:
+    """LLM calls, tokens and coworker delegations consumed by one pipeline run"""
+
+    def __init__(self):
+        self.llm_calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.total_tokens = 0
+        self.delegations = 0
+        self.refused_delegations = 0
+        self._lock = threading.Lock()
+
+    def add_crew_output(self, crew_output):
+        """Add the token usage a crew reported for its kickoff"""
+        usage = usage_dict(crew_output.token_usage)
+        with self._lock:
+            self.llm_calls += usage.get("successful_requests", 0)
+            self.prompt_tokens += usage.get("prompt_tokens", 0)
+            self.completion_tokens += usage.get("completion_tokens", 0)
+            self.total_tokens += usage.get("total_tokens", 0)
+
+    def add_message(self, message):
+        """Add the token usage of one direct LLM call from its LangChain response message"""
+        usage = (getattr(message, "response_metadata", None) or {}).get("token_usage") or {}
+        with self._lock:
+            self.llm_calls += 1
+            self.prompt_tokens += usage.get("prompt_tokens", 0)
+            self.completion_tokens += usage.get("completion_tokens", 0)
+            self.total_tokens += usage.get("total_tokens", 0)
+
+    def record_delegation(self, allowed):
+        with self._lock:
+            if allowed:
+                self.delegations += 1
+            else:
+                self.refused_delegations += 1
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                "llm_calls": self.llm_calls,
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+                "total_tokens": self.total_tokens,
+                "delegations": self.delegations,
+                "refused_delegations": self.refused_delegations
+            }
+
+
+class DelegationBudget:
+    """Caps how deep delegation chains nest and how many coworker calls a task makes
+
+    A top-level task runs at depth 0; a coworker it asks runs at depth 1, a
+    coworker asked by that coworker at depth 2, and so on. Calls past either
+    limit are answered with a refusal instead of running the coworker.
+    """
+
+    def __init__(self, max_depth=1, max_calls_per_task=2, usage=None):
+        self.max_depth = max_depth
+        self.max_calls_per_task = max_calls_per_task
+        self.usage = usage if usage is not None else RunUsage()
+
+    @contextmanager
+    def enter(self):
+        """Enter a task execution, yielding a refusal message if it is over budget"""
+        depth = _depth.get()
+        if depth is None:
+            depth_token = _depth.set(0)
+            calls_token = _task_calls.set([0])
+            try:
+                yield None
+            finally:
+                _task_calls.reset(calls_token)
+                _depth.reset(depth_token)
+            return
+
+        calls = _task_calls.get()
+        if depth + 1 > self.max_depth:
+            self.usage.record_delegation(allowed=False)
+            yield REFUSAL.format(reason=f"max depth {self.max_depth}")
+            return
+        if calls[0] >= self.max_calls_per_task:
+            self.usage.record_delegation(allowed=False)
+            yield REFUSAL.format(reason=f"{self.max_calls_per_task} coworker calls per task")
+            return
+
+        calls[0] += 1
+        self.usage.record_delegation(allowed=True)
+        depth_token = _depth.set(depth + 1)
+        try:
+            yield None
+        finally:
+            _depth.reset(depth_token)
+
+
+def current_budget():
+    """Return the delegation budget active in this context, if any"""
+    return _active_budget.get()
+
+
+@contextmanager
+def activate(budget):
+    """Apply a delegation budget to every task executed inside the block"""
+    token = _active_budget.set(budget)
+    try:
+        yield budget
+    finally:
+        _active_budget.reset(token)
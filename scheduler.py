@@ -0,0 +1,206 @@
+"""Deterministic integration of timed meal, workout and mindfulness entries.
+
+The planning stages each propose times for their own activities. Fitting
+them into one day is an interval-scheduling problem, so it is solved here
+rather than by another LLM round trip: entries are placed in time order,
+any that would overlap an earlier one or break a spacing rule (such as no
+workout soon after a meal) are pushed to the earliest time that fits, and
+the result is rendered as an hour-by-hour timetable.
+"""
+from bisect import bisect_left
+import re
+
+DAY_START = 5 * 60
+DAY_END = 23 * 60
+
+# When two entries start together, the earlier kind keeps its time
+KIND_PRIORITY = {"meal": 0, "mindfulness": 1, "workout": 2}
+
+KIND_LABELS = {"meal": "🥗 Meal", "workout": "💪 Workout", "mindfulness": "🧘 Mindfulness"}
+
+_TIME = re.compile(r"^\s*(\d{1,2})(?::(\d{2}))?\s*([ap]\.?m\.?)?\s*$", re.IGNORECASE)
+
+
+def parse_time(value):
+    """Return minutes after midnight for 'HH:MM', '7:30', '7pm' or '7:30 AM'"""
+    match = _TIME.match(str(value))
+    if match is None:
+        raise ValueError(f"Unrecognised time: {value!r}")
+    hour, minute = int(match.group(1)), int(match.group(2) or 0)
+    meridiem = (match.group(3) or "").lower().replace(".", "")
+    if meridiem == "pm" and hour < 12:
+        hour += 12
+    elif meridiem == "am" and hour == 12:
+        hour = 0
+    if hour > 23 or minute > 59:
+        raise ValueError(f"Unrecognised time: {value!r}")
+    return hour * 60 + minute
+
+
+def format_time(minutes):
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+class ScheduledItem:
+    """One activity placed in the day"""
+
+    def __init__(self, kind, activity, start, duration, items=(), requested=None):
+        self.kind = kind
+        self.activity = activity
+        self.start = start
+        self.duration = duration
+        self.items = list(items)
+        self.requested = start if requested is None else requested
+
+    @property
+    def end(self):
+        return self.start + self.duration
+
+    def span(self):
+        return f"{format_time(self.start)}–{format_time(self.end)}"
+
+
+class IntervalIndex:
+    """Placed items kept sorted by start, for overlap queries"""
+
+    def __init__(self):
+        self._starts = []
+        self._items = []
+        self._longest = 0
+
+    def add(self, item):
+        position = bisect_left(self._starts, item.start)
+        self._starts.insert(position, item.start)
+        self._items.insert(position, item)
+        self._longest = max(self._longest, item.duration)
+
+    def overlapping(self, start, end):
+        """Return the items whose interval intersects [start, end)"""
+        # No item starting before start - longest can reach start
+        lo = bisect_left(self._starts, start - self._longest)
+        hi = bisect_left(self._starts, end)
+        return [item for item in self._items[lo:hi] if item.end > start]
+
+    def __iter__(self):
+        return iter(self._items)
+
+
+class Schedule:
+    """The integrated day: placed items and the changes made to fit them"""
+
+    def __init__(self, items, adjustments):
+        self.items = items
+        self.adjustments = adjustments
+
+    def to_markdown(self):
+        """Return an hour-by-hour timetable followed by the adjustments made"""
+        lines = ["### Hour-by-Hour Timetable", "", "| Hour | Time | Activity | Details |", "|---|---|---|---|"]
+        by_hour = {}
+        for item in self.items:
+            by_hour.setdefault(item.start // 60, []).append(item)
+        if by_hour:
+            for hour in range(min(by_hour), max(by_hour) + 1):
+                hour_items = by_hour.get(hour)
+                if not hour_items:
+                    lines.append(f"| {hour:02d}:00 | | Free | |")
+                    continue
+                for i, item in enumerate(hour_items):
+                    lines.append(
+                        f"| {f'{hour:02d}:00' if i == 0 else ''} | {item.span()} | "
+                        f"{KIND_LABELS.get(item.kind, item.kind)}: {item.activity} | {', '.join(item.items)} |"
+                    )
+        if self.adjustments:
+            lines += ["", "### Schedule Adjustments", ""]
+            lines += [f"- {adjustment}" for adjustment in self.adjustments]
+        return "\n".join(lines)
+
+    def compact(self):
+        """Return one terse line per activity, for prompts"""
+        return "\n".join(f"{item.span()} {item.kind}: {item.activity}" for item in self.items)
+
+
+class Scheduler:
+    """Places entries so that none overlap and spacing rules hold
+
+    ``gaps`` maps (earlier kind, later kind) to the minutes that must pass
+    between the end of the first and the start of the second, on top of the
+    ``buffer`` left between any two activities for transitions.
+    """
+
+    def __init__(self, gaps=None, buffer=5, day_start=DAY_START, day_end=DAY_END):
+        self.gaps = dict(gaps or {})
+        self.buffer = buffer
+        self.day_start = day_start
+        self.day_end = day_end
+
+    def gap(self, earlier, later):
+        return self.buffer + self.gaps.get((earlier.kind, later.kind), 0)
+
+    def blocking(self, index, item, start):
+        """Return the placed item that rules out starting item at start, and the earliest start it allows"""
+        reach = self.buffer + max(self.gaps.values(), default=0)
+        end = start + item.duration
+        latest = None
+        for placed in index.overlapping(start - reach, end + reach):
+            allowed = placed.end + self.gap(placed, item)
+            if start < allowed and placed.start < end + self.gap(item, placed):
+                if latest is None or allowed > latest[1]:
+                    latest = (placed, allowed)
+        return latest
+
+    def place(self, index, item):
+        """Return (start, reason) for the earliest start at or after item's own that fits"""
+        start = max(item.start, self.day_start)
+        reason = None
+        while start + item.duration <= self.day_end:
+            blocked = self.blocking(index, item, start)
+            if blocked is None:
+                return start, reason
+            placed, start = blocked
+            reason = placed
+        return None, reason
+
+    def build(self, plans):
+        """Build a Schedule from {kind: [entry, ...]} where entries have time, activity, duration_minutes and items"""
+        pending = []
+        adjustments = []
+        for kind, entries in plans.items():
+            for entry in entries:
+                try:
+                    start = parse_time(entry["time"])
+                except ValueError:
+                    adjustments.append(f"Left out {entry['activity']}: could not read its time {entry['time']!r}")
+                    continue
+                pending.append(ScheduledItem(
+                    kind, entry["activity"], start, max(int(entry["duration_minutes"]), 0), entry.get("items", ())
+                ))
+        pending.sort(key=lambda item: (item.start, KIND_PRIORITY.get(item.kind, len(KIND_PRIORITY))))
+
+        index = IntervalIndex()
+        for item in pending:
+            start, blocker = self.place(index, item)
+            if start is None and blocker is None:
+                # Runs past the end of the day on its own; nothing to resolve
+                pass
+            elif start is None:
+                adjustments.append(
+                    f"Kept {item.activity} at {format_time(item.requested)} although it clashes with "
+                    f"{blocker.activity}; no later slot fits before {format_time(self.day_end)}"
+                )
+            elif start != item.requested:
+                item.start = start
+                if blocker is not None:
+                    adjustments.append(
+                        f"Moved {item.activity} from {format_time(item.requested)} to {format_time(start)} "
+                        f"to follow {blocker.activity} ({blocker.span()})"
+                    )
+                else:
+                    adjustments.append(f"Moved {item.activity} from {format_time(item.requested)} to {format_time(start)}")
+            index.add(item)
+        return Schedule(list(index), adjustments)
+
+
+def build_schedule(plans, meal_workout_gap=60, buffer=5):
+    """Integrate {kind: entries} plans with the default spacing rules"""
+    scheduler = Scheduler(gaps={("meal", "workout"): meal_workout_gap}, buffer=buffer)
+    return scheduler.build(plans)
@@ -0,0 +1,127 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def env_flag(name, default=False):
+    """Read a boolean setting from the environment"""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def env_int(name, default):
+    """Read an integer setting from the environment"""
+    value = os.getenv(name)
+    return default if value in (None, "") else int(value)
+
+
+def env_float(name, default):
+    """Read a float setting from the environment"""
+    value = os.getenv(name)
+    return default if value in (None, "") else float(value)
+
+
+# Run independent planning tasks concurrently instead of one after another
+PARALLEL_PLANNING = env_flag("PARALLEL_PLANNING")
+
+# Delegation budget applied to every crew run: how deeply coworkers may ask
+# other coworkers, and how many coworker calls a single task may make
+MAX_DELEGATION_DEPTH = env_int("MAX_DELEGATION_DEPTH", 1)
+MAX_COWORKER_CALLS_PER_TASK = env_int("MAX_COWORKER_CALLS_PER_TASK", 2)
+
+# Model responses kept in memory by SimpleHealthAdvisor, and for how many seconds
+RESPONSE_CACHE_SIZE = env_int("RESPONSE_CACHE_SIZE", 256)
+RESPONSE_CACHE_TTL = env_int("RESPONSE_CACHE_TTL", 3600)
+
+# Open the API connection in the background at startup so the first request
+# does not pay for DNS, TCP and TLS setup
+PREWARM_LLM_CONNECTION = env_flag("PREWARM_LLM_CONNECTION")
+
+# SQLite file holding pre-generated plans that the app serves before calling the LLM
+PLAN_STORE_PATH = os.getenv("PLAN_STORE_PATH", "plans.db")
+
+# SQLite file of users' daily adherence logs and their weekly rollups
+HISTORY_STORE_PATH = os.getenv("HISTORY_STORE_PATH", "history.db")
+
+# Shared limits for every OpenAI call made by the process, and how often a
+# rate-limited (429) or failed (5xx) call is retried with backoff
+RATE_LIMIT_RPM = env_int("RATE_LIMIT_RPM", 500)
+RATE_LIMIT_TPM = env_int("RATE_LIMIT_TPM", 30000)
+LLM_MAX_RETRIES = env_int("LLM_MAX_RETRIES", 5)
+
+# Where per-stage and per-call metrics are written after each run: Prometheus
+# text format for a .prom path, JSON otherwise; unset to skip the export
+METRICS_EXPORT_PATH = os.getenv("METRICS_EXPORT_PATH")
+
+# Have the planning agents return schema-validated plans and hand later
+# stages a compact form of them instead of the full prose
+STRUCTURED_PLANS = env_flag("STRUCTURED_PLANS")
+
+# Build the integrated schedule with the local interval scheduler instead of
+# the coordinator crew (implies STRUCTURED_PLANS; the crew is still used when
+# a plan comes back unstructured). The LLM then only writes an optional
+# narrative. Activities are kept ACTIVITY_BUFFER_MINUTES apart, and a workout
+# starts at least MEAL_WORKOUT_GAP_MINUTES after a meal ends
+LOCAL_SCHEDULER = env_flag("LOCAL_SCHEDULER")
+SCHEDULE_NARRATIVE = env_flag("SCHEDULE_NARRATIVE", True)
+MEAL_WORKOUT_GAP_MINUTES = env_int("MEAL_WORKOUT_GAP_MINUTES", 60)
+ACTIVITY_BUFFER_MINUTES = env_int("ACTIVITY_BUFFER_MINUTES", 5)
+
+# Production mode: agents and crews stop printing, and their steps and the
+# pipeline outputs go to a bounded, non-blocking log queue as JSON lines
+# (to LOG_FILE, or stderr). Records below WARNING are kept at LOG_SAMPLE_RATE;
+# records arriving while the queue is full are dropped and counted
+QUIET_MODE = env_flag("QUIET_MODE")
+VERBOSE = not QUIET_MODE
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FILE = os.getenv("LOG_FILE")
+LOG_QUEUE_SIZE = env_int("LOG_QUEUE_SIZE", 10000)
+LOG_SAMPLE_RATE = env_float("LOG_SAMPLE_RATE", 1.0)
+
+# Models for each tier of the per-stage routing table in model_router.py;
+# with MODEL_ROUTING off every stage uses the large tier. The large tier is
+# gpt-4o for both advisors, so SimpleHealthAdvisor, which used gpt-4 before,
+# now runs on gpt-4o as well; set MODEL_TIER_LARGE=gpt-4 to keep it. With
+# LATENCY_FALLBACK on (it is off by default, so downgrades are opt-in), a
+# stage whose p95 over its last LATENCY_WINDOW runs (once it has
+# LATENCY_MIN_SAMPLES) exceeds its SLO moves to the next faster tier for
+# FALLBACK_COOLDOWN_SECONDS
+MODEL_ROUTING = env_flag("MODEL_ROUTING", True)
+MODEL_TIER_LARGE = os.getenv("MODEL_TIER_LARGE", "gpt-4o")
+MODEL_TIER_FAST = os.getenv("MODEL_TIER_FAST", "gpt-4o-mini")
+LATENCY_FALLBACK = env_flag("LATENCY_FALLBACK", False)
+LATENCY_WINDOW = env_int("LATENCY_WINDOW", 50)
+LATENCY_MIN_SAMPLES = env_int("LATENCY_MIN_SAMPLES", 5)
+FALLBACK_COOLDOWN_SECONDS = env_float("FALLBACK_COOLDOWN_SECONDS", 300)
+
+# Serve plans generated for near-identical profiles (see similarity_cache.py):
+# a stored profile within SIMILARITY_THRESHOLD of the submitted one, with the
+# same diet and excluded foods, is reused instead of calling the LLM.
+# SIMILARITY_CACHE_SIZE bounds the profiles kept per process
+SIMILARITY_CACHE = env_flag("SIMILARITY_CACHE")
+SIMILARITY_THRESHOLD = env_float("SIMILARITY_THRESHOLD", 0.3)
+SIMILARITY_CACHE_SIZE = env_int("SIMILARITY_CACHE_SIZE", 1024)
+
+# Background plan generation in the Streamlit app: JOB_WORKERS plans are
+# generated at once, at most JOB_QUEUE_SIZE more wait their turn, pages poll
+# every JOB_POLL_SECONDS, and finished jobs are kept JOB_RETENTION_SECONDS
+# for pages reloaded from a job link
+JOB_WORKERS = env_int("JOB_WORKERS", 4)
+JOB_QUEUE_SIZE = env_int("JOB_QUEUE_SIZE", 32)
+JOB_POLL_SECONDS = env_float("JOB_POLL_SECONDS", 1.0)
+JOB_RETENTION_SECONDS = env_int("JOB_RETENTION_SECONDS", 3600)
+
+# Connection pool shared by every OpenAI call in the process: at most
+# LLM_MAX_CONNECTIONS open at once, LLM_MAX_KEEPALIVE_CONNECTIONS of them
+# kept idle for LLM_KEEPALIVE_EXPIRY seconds. Requests wait up to
+# LLM_POOL_TIMEOUT seconds for a free connection, LLM_CONNECT_TIMEOUT to
+# connect and LLM_READ_TIMEOUT for each read
+LLM_MAX_CONNECTIONS = env_int("LLM_MAX_CONNECTIONS", 20)
+LLM_MAX_KEEPALIVE_CONNECTIONS = env_int("LLM_MAX_KEEPALIVE_CONNECTIONS", 10)
+LLM_KEEPALIVE_EXPIRY = env_float("LLM_KEEPALIVE_EXPIRY", 60)
+LLM_CONNECT_TIMEOUT = env_float("LLM_CONNECT_TIMEOUT", 10)
+LLM_READ_TIMEOUT = env_float("LLM_READ_TIMEOUT", 120)
+LLM_POOL_TIMEOUT = env_float("LLM_POOL_TIMEOUT", 120)
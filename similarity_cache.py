@@ -0,0 +1,189 @@
+"""Nearest-neighbour cache that serves results for near-identical profiles.
+
+Profiles are encoded locally into fixed feature vectors: goals and
+equipment as multi-hot columns ("None" counts as no equipment), and fitness
+level and mood as positions on their scales, so "Calm" sits a quarter step
+from "Very Calm". Fields where a near miss would give a wrong plan, such as
+the diet and excluded foods, or values the encoding does not know, are not
+vectorized: they must match exactly and partition the cache. A lookup
+compares the profile's vector against every stored one in its partition
+with NumPy and returns the nearest entry's value when its distance is within
+the threshold.
+
+Usage:
+    cache = SimilarityCache(threshold=0.3)
+    cache.put(profile, plan, namespace="meal_plan")
+    hit = cache.get(other_profile, namespace="meal_plan")  # (plan, distance) or None
+"""
+import json
+import threading
+from collections import OrderedDict
+
+from profiles import EQUIPMENT_OPTIONS, FITNESS_LEVEL_OPTIONS, GOAL_OPTIONS, MOOD_OPTIONS
+from response_cache import canonical_profile
+
+
+def _token(value):
+    return str(value).strip().lower().replace(" ", "_")
+
+
+GOALS = [_token(goal) for goal in GOAL_OPTIONS]
+EQUIPMENT = [_token(item) for item in EQUIPMENT_OPTIONS if _token(item) != "none"]
+FITNESS_LEVELS = [_token(level) for level in FITNESS_LEVEL_OPTIONS]
+MOODS = [_token(mood) for mood in MOOD_OPTIONS]
+
+# How far apart one step of difference puts two profiles: a different goal
+# or fitness level is always a miss at the default threshold, while a single
+# piece of equipment or one step of mood alone is within it
+GOAL_WEIGHT = 1.0
+EQUIPMENT_WEIGHT = 0.25
+FITNESS_WEIGHT = 1.0
+MOOD_WEIGHT = 1.0
+
+DIMENSIONS = len(GOALS) + len(EQUIPMENT) + 2
+
+
+def _selected(value):
+    """Return the tokens chosen in a multiselect field given as a dict of flags, a list or a string"""
+    if value is None:
+        return set()
+    if isinstance(value, dict):
+        return {_token(key) for key, chosen in value.items() if chosen}
+    if isinstance(value, (list, tuple, set)):
+        return {_token(item) for item in value}
+    return {_token(value)}
+
+
+def _scale(value, levels):
+    """Return a value's position on an ordered scale in [0, 1], or None if it is not on it"""
+    token = _token(value)
+    if token not in levels:
+        return None
+    return levels.index(token) / (len(levels) - 1)
+
+
+def encode_profile(user_profile):
+    """Return (partition, vector) for a user profile
+
+    The partition is a string that similar profiles must share exactly; the
+    vector is a list of DIMENSIONS floats.
+    """
+    profile = dict(user_profile)
+    exact = {}
+    vector = [0.0] * DIMENSIONS
+
+    goals = _selected(profile.pop("goals", None))
+    for i, goal in enumerate(GOALS):
+        vector[i] = GOAL_WEIGHT if goal in goals else 0.0
+    exact["goals"] = sorted(goals - set(GOALS))
+
+    offset = len(GOALS)
+    equipment = _selected(profile.pop("available_equipment", None)) - {"none"}
+    for i, item in enumerate(EQUIPMENT):
+        vector[offset + i] = EQUIPMENT_WEIGHT if item in equipment else 0.0
+    exact["available_equipment"] = sorted(equipment - set(EQUIPMENT))
+
+    offset += len(EQUIPMENT)
+    for i, (field, levels, weight) in enumerate([
+        ("fitness_level", FITNESS_LEVELS, FITNESS_WEIGHT),
+        ("mood", MOODS, MOOD_WEIGHT)
+    ]):
+        if field not in profile:
+            continue
+        value = profile.pop(field)
+        position = _scale(value, levels)
+        if position is None:
+            exact[field] = value
+        else:
+            vector[offset + i] = weight * position
+            exact[f"has_{field}"] = True
+
+    # Everything else, preferences included, must match exactly
+    exact["rest"] = profile
+    return json.dumps(canonical_profile(exact), sort_keys=True, default=str), vector
+
+
+class SimilarityCache:
+    """Thread-safe LRU cache looked up by nearest profile within a distance threshold"""
+
+    def __init__(self, threshold=0.3, maxsize=1024):
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        # (namespace, partition, vector) -> value, least recently used first
+        self._entries = OrderedDict()
+        # (namespace, partition) -> (entry keys, matrix), rebuilt after changes
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    def put(self, user_profile, value, namespace=None):
+        """Store a value for a profile, evicting the least recently used entries when full"""
+        partition, vector = encode_profile(user_profile)
+        key = (namespace, partition, tuple(vector))
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            self._indexes.pop((namespace, partition), None)
+            while len(self._entries) > self.maxsize:
+                evicted, _ = self._entries.popitem(last=False)
+                self._indexes.pop(evicted[:2], None)
+
+    def get(self, user_profile, namespace=None):
+        """Return (value, distance) for the nearest stored profile within the threshold, or None"""
+        import numpy as np
+
+        partition, vector = encode_profile(user_profile)
+        with self._lock:
+            index = self._index(namespace, partition)
+            if index is None:
+                self.misses += 1
+                return None
+            keys, matrix = index
+            distances = np.linalg.norm(matrix - np.asarray(vector), axis=1)
+            nearest = int(np.argmin(distances))
+            distance = float(distances[nearest])
+            if distance > self.threshold:
+                self.misses += 1
+                return None
+            if distance == 0:
+                self.hits += 1
+            else:
+                self.near_hits += 1
+            self._entries.move_to_end(keys[nearest])
+            return self._entries[keys[nearest]], distance
+
+    def _index(self, namespace, partition):
+        import numpy as np
+
+        index = self._indexes.get((namespace, partition))
+        if index is None:
+            keys = [key for key in self._entries if key[:2] == (namespace, partition)]
+            if not keys:
+                return None
+            index = (keys, np.array([key[2] for key in keys], dtype=float))
+            self._indexes[(namespace, partition)] = index
+        return index
+
+    def clear(self):
+        """Drop all entries and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self._indexes.clear()
+            self.hits = 0
+            self.near_hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """Return the current size and exact, near and missed lookup counters"""
+        with self._lock:
+            lookups = self.hits + self.near_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "near_hits": self.near_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.near_hits) / lookups if lookups else 0.0
+            }
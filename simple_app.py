@@ -1,14 +1,26 @@
 import streamlit as st
+import metrics
 from simple_health_advisor import SimpleHealthAdvisor
-from datetime import datetime, timedelta
+from history_store import DEFAULT_USER_ID, get_history_store
+from llm_clients import prewarm_if_enabled
+from profiles import (
+    GOAL_OPTIONS, DEFAULT_GOALS, DIET_OPTIONS, RESTRICTION_OPTIONS,
+    FITNESS_LEVEL_OPTIONS, EQUIPMENT_OPTIONS, MOOD_OPTIONS,
+    build_user_profile, profile_key
+)
 import json
 
+# How many profiles' plans a session keeps around
+MAX_STORED_PLANS = 5
+
 st.set_page_config(
     page_title="AI Health & Wellness Coach",
     page_icon="🏋️‍♀️",
     layout="wide"
 )
 
+prewarm_if_enabled()
+
 # Custom CSS for better visualization
 st.markdown("""
     <style>
@@ -240,9 +252,9 @@ st.markdown("""
     </style>
     """, unsafe_allow_html=True)
 
-def display_agent_message(role, content, icon):
-    """Display a message from an agent with custom styling"""
-    st.markdown(f"""
+def render_agent_message(role, content, icon):
+    """Build the HTML for a message from an agent"""
+    return f"""
         <div class="agent-message {role.lower().replace(' ', '')}">
             <div class="agent-header">
                 <span class="agent-icon">{icon}</span>
@@ -252,7 +264,25 @@ def display_agent_message(role, content, icon):
                 {content}
             </div>
         </div>
-    """, unsafe_allow_html=True)
+    """
+
+def display_agent_message(role, content, icon):
+    """Display a message from an agent with custom styling
+
+    ``content`` may be a string or an iterable of text chunks, in which case
+    the message is redrawn as each chunk arrives. Returns the full text.
+    """
+    if isinstance(content, str):
+        st.markdown(render_agent_message(role, content, icon), unsafe_allow_html=True)
+        return content
+
+    placeholder = st.empty()
+    text = ""
+    for chunk in content:
+        text += chunk
+        placeholder.markdown(render_agent_message(role, text + " ▌", icon), unsafe_allow_html=True)
+    placeholder.markdown(render_agent_message(role, text, icon), unsafe_allow_html=True)
+    return text
 
 def display_interaction_arrow():
     """Display an arrow indicating agent interaction"""
@@ -262,6 +292,83 @@ def display_interaction_arrow():
         </div>
     """, unsafe_allow_html=True)
 
+def show_plan(results, history, refresh_report=False):
+    """Display a plan's stages, generating any that are not in ``results`` yet
+
+    Each generated stage is stored in ``results`` as soon as it completes.
+    A progress report written before the user's latest logs is regenerated
+    only when ``refresh_report`` is set or the user asks for it.
+    """
+    user_profile = results["profile"]
+    history_key = profile_key({"history": history})
+    if "progress_report" in results and results.get("history_key") != history_key:
+        if refresh_report or st.button("Update Weekly Report"):
+            results.pop("progress_report")
+        else:
+            st.info("Your daily logs have changed since this weekly report was written. Click Update Weekly Report to refresh it.")
+    advisor = None
+    if "progress_report" not in results:
+        advisor = SimpleHealthAdvisor()
+
+    # Create tabs for different stages
+    tab1, tab2, tab3 = st.tabs(["Initial Planning", "Schedule Integration", "Weekly Report"])
+
+    with tab1:
+        st.header("Initial Planning Phase")
+        st.info("Your specialists are creating their initial recommendations...")
+        
+        # Get all three plans at once; none of them depends on the others
+        if "mindfulness_plan" not in results:
+            with st.spinner("🥗 💪 🧘‍♀️ Your specialists are creating their plans..."):
+                meal_plan, workout_plan, mindfulness_plan = advisor.create_initial_plans(user_profile)
+            results["meal_plan"] = meal_plan
+            results["workout_plan"] = workout_plan
+            results["mindfulness_plan"] = mindfulness_plan
+        
+        display_agent_message("Nutritionist", results["meal_plan"], "🥗")
+        display_interaction_arrow()
+        
+        display_agent_message("Fitness Planner", results["workout_plan"], "💪")
+        display_interaction_arrow()
+        
+        display_agent_message("Mindfulness Guide", results["mindfulness_plan"], "🧘‍♀️")
+        display_interaction_arrow()
+        
+        # Stream the integrated schedule as the coordinator writes it
+        results["integrated_schedule"] = display_agent_message(
+            "Schedule Coordinator",
+            results.get("integrated_schedule") or advisor.stream_integrated_schedule(
+                results["meal_plan"], results["workout_plan"], results["mindfulness_plan"]
+            ),
+            "📅"
+        )
+
+    with tab2:
+        st.header("Schedule Integration Phase")
+        st.info("Your Schedule Coordinator is creating a cohesive daily schedule...")
+        
+        # Display the integrated schedule
+        st.markdown("### Final Integrated Schedule")
+        st.markdown(results["integrated_schedule"])
+
+    with tab3:
+        st.header("Weekly Progress Report")
+        st.info("Your Progress Reporter is analyzing your schedule and preparing recommendations...")
+        
+        # Stream the progress report as it is generated
+        generated = "progress_report" not in results
+        results["progress_report"] = display_agent_message(
+            "Progress Reporter",
+            results.get("progress_report") or advisor.stream_progress_report(history, results["integrated_schedule"]),
+            "📊"
+        )
+        # A kept report stays tied to the logs it was written from
+        if generated:
+            results["history_key"] = history_key
+
+    if advisor is not None:
+        metrics.export_if_configured()
+
 def main():
     st.title("🏋️‍♀️ AI Health & Wellness Coach")
     st.markdown("""
@@ -279,110 +386,59 @@ def main():
         st.header("Your Profile")
         goals = st.multiselect(
             "Health Goals",
-            ["Weight Loss", "Muscle Gain", "Stress Reduction", "Better Sleep", "More Energy"],
-            default=["Weight Loss", "More Energy"]
+            GOAL_OPTIONS,
+            default=DEFAULT_GOALS
         )
         
         diet = st.selectbox(
             "Dietary Preference",
-            ["Balanced", "Vegetarian", "Vegan", "Keto", "Mediterranean"]
+            DIET_OPTIONS
         )
         
         restrictions = st.multiselect(
             "Dietary Restrictions",
-            ["No Nuts", "No Dairy", "No Gluten", "No Shellfish", "No Eggs"]
+            RESTRICTION_OPTIONS
         )
         
         fitness_level = st.select_slider(
             "Fitness Level",
-            options=["Beginner", "Intermediate", "Advanced"]
+            options=FITNESS_LEVEL_OPTIONS
         )
         
         equipment = st.multiselect(
             "Available Equipment",
-            ["Yoga Mat", "Resistance Bands", "Dumbbells", "Pull-up Bar", "None"]
+            EQUIPMENT_OPTIONS
         )
         
         mood = st.select_slider(
             "Current Stress Level",
-            options=["Very Stressed", "Stressed", "Neutral", "Calm", "Very Calm"]
+            options=MOOD_OPTIONS
         )
 
+        # Progress reports cover this user's logged days
+        user_id = st.text_input("User ID", value=DEFAULT_USER_ID).strip() or DEFAULT_USER_ID
+
     # Main content area
-    if st.button("Generate My Health Plan"):
-        with st.spinner("Your AI health team is working on your personalized plan..."):
-            # Create user profile
-            user_profile = {
-                "goals": {goal.lower().replace(" ", "_"): True for goal in goals},
-                "preferences": {
-                    "diet": diet.lower(),
-                    "exclude": [r.lower().replace(" ", "_") for r in restrictions]
-                },
-                "fitness_level": fitness_level.lower(),
-                "available_equipment": equipment,
-                "mood": mood.lower()
-            }
-
-            # Initialize the health advisor
-            advisor = SimpleHealthAdvisor()
-
-            # Create tabs for different stages
-            tab1, tab2, tab3 = st.tabs(["Initial Planning", "Schedule Integration", "Weekly Report"])
-
-            with tab1:
-                st.header("Initial Planning Phase")
-                st.info("Your specialists are creating their initial recommendations...")
-                
-                # Get meal plan
-                with st.spinner("🥗 Nutritionist is creating your meal plan..."):
-                    meal_plan = advisor.create_meal_plan(user_profile)
-                
-                display_agent_message("Nutritionist", meal_plan, "🥗")
-                display_interaction_arrow()
-                
-                # Get workout plan
-                with st.spinner("💪 Fitness Planner is designing your workout..."):
-                    workout_plan = advisor.create_workout_plan(user_profile)
-                
-                display_agent_message("Fitness Planner", workout_plan, "💪")
-                display_interaction_arrow()
-                
-                # Get mindfulness plan
-                with st.spinner("🧘‍♀️ Mindfulness Guide is creating your meditation plan..."):
-                    mindfulness_plan = advisor.create_mindfulness_plan(user_profile)
-                
-                display_agent_message("Mindfulness Guide", mindfulness_plan, "🧘‍♀️")
-                display_interaction_arrow()
-                
-                # Get integrated schedule
-                with st.spinner("📅 Schedule Coordinator is integrating all plans..."):
-                    integrated_schedule = advisor.create_integrated_schedule(meal_plan, workout_plan, mindfulness_plan)
-                
-                display_agent_message("Schedule Coordinator", integrated_schedule, "📅")
-
-            with tab2:
-                st.header("Schedule Integration Phase")
-                st.info("Your Schedule Coordinator is creating a cohesive daily schedule...")
-                
-                # Display the integrated schedule
-                st.markdown("### Final Integrated Schedule")
-                st.markdown(integrated_schedule)
-
-            with tab3:
-                st.header("Weekly Progress Report")
-                st.info("Your Progress Reporter is analyzing your schedule and preparing recommendations...")
-                
-                # Simulate history
-                history = [
-                    {"date": (datetime.now() - timedelta(days=i)).strftime("%Y-%m-%d")}
-                    for i in range(7)
-                ]
-
-                # Get progress report
-                with st.spinner("📊 Progress Reporter is generating your weekly report..."):
-                    progress_report = advisor.create_progress_report(history, integrated_schedule)
-                
-                display_agent_message("Progress Reporter", progress_report, "📊")
+    user_profile = build_user_profile(goals, diet, restrictions, fitness_level, equipment, mood)
+    key = profile_key(user_profile)
+    plans = st.session_state.setdefault("plans", {})
+
+    refresh_report = st.button("Generate My Health Plan")
+    if refresh_report:
+        # Stages already generated for this exact profile are reused, so only
+        # a changed profile costs new LLM calls
+        plans.setdefault(key, {"profile": user_profile})
+        while len(plans) > MAX_STORED_PLANS:
+            plans.pop(next(iter(plans)))
+        st.session_state["active_plan"] = key
+
+    # Render from session state so widget interactions after generation do
+    # not discard the plan; a run interrupted by a rerun resumes where it stopped
+    active = st.session_state.get("active_plan")
+    if active in plans:
+        if active != key:
+            st.info("Your profile has changed since this plan was generated. Click the button to update it.")
+        show_plan(plans[active], get_history_store().summary(user_id), refresh_report)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -1,21 +1,134 @@
-import openai
-import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
+import time
+import metrics
+from llm_clients import get_openai_client
+from model_router import model_router
+from response_cache import ResponseCache, canonical_profile
+from settings import (
+    RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL, SIMILARITY_CACHE, SIMILARITY_CACHE_SIZE, SIMILARITY_THRESHOLD
+)
+from similarity_cache import SimilarityCache
 
 load_dotenv()
 
-# Initialize OpenAI client
-client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+TEMPERATURE = 0.7
+
+# Agent role each stage speaks as, used to label its metrics
+STAGE_ROLES = {
+    "meal_plan": "Nutritionist",
+    "workout_plan": "Fitness Planner",
+    "mindfulness_plan": "Mindfulness Guide",
+    "integrated_schedule": "Schedule Coordinator",
+    "progress_report": "Progress Reporter"
+}
+
+# Profile fields each plan prompt reads; profiles whose values of them are
+# near-identical share that plan when the similarity cache is on
+STAGE_FIELDS = {
+    "meal_plan": ["goals", "preferences", "fitness_level"],
+    "workout_plan": ["fitness_level", "available_equipment"],
+    "mindfulness_plan": ["mood"]
+}
+
+# Responses shared by every advisor in the process, so identical profiles
+# submitted from different sessions are only sent to the model once
+response_cache = ResponseCache(
+    maxsize=RESPONSE_CACHE_SIZE,
+    ttl=RESPONSE_CACHE_TTL
+)
+similarity_cache = SimilarityCache(
+    threshold=SIMILARITY_THRESHOLD, maxsize=SIMILARITY_CACHE_SIZE
+) if SIMILARITY_CACHE else None
 
 class SimpleHealthAdvisor:
     """Simplified health advisor that doesn't use CrewAI"""
     
-    def __init__(self):
-        self.client = client
+    def __init__(self, cache=None, client=None, similar=None):
+        # The shared OpenAI client is built on first use, not at import time
+        self.client = client if client is not None else get_openai_client()
+        self.cache = cache if cache is not None else response_cache
+        self.similar = similar if similar is not None else similarity_cache
     
-    def create_meal_plan(self, user_profile):
-        """Create a personalized meal plan"""
+    def _similar_key(self, stage, profile, model):
+        """Return (stage profile, namespace) for a similarity lookup, or None if the stage has none"""
+        if self.similar is None or profile is None or stage not in STAGE_FIELDS:
+            return None
+        stage_profile = {field: profile[field] for field in STAGE_FIELDS[stage] if field in profile}
+        return stage_profile, (stage, model, TEMPERATURE)
+    
+    def _cached(self, stage, key, profile, model):
+        """Return an exact cached response, else one for a near-identical profile, else None"""
+        cached = self.cache.get(key)
+        similar_key = self._similar_key(stage, profile, model)
+        if cached is None and similar_key is not None:
+            hit = self.similar.get(*similar_key)
+            cached = hit[0] if hit else None
+        return cached
+    
+    def _remember(self, stage, key, profile, model, content):
+        self.cache.set(key, content)
+        similar_key = self._similar_key(stage, profile, model)
+        if similar_key is not None:
+            self.similar.put(similar_key[0], content, namespace=similar_key[1])
+    
+    def _complete(self, stage, prompt, profile=None):
+        """Send a prompt to the model and return the whole response"""
+        with metrics.stage(stage, role=STAGE_ROLES[stage]):
+            model = model_router.model(stage)
+            key = self.cache.make_key(profile, prompt, model, TEMPERATURE)
+            cached = self._cached(stage, key, profile, model)
+            if cached is not None:
+                return cached
+            
+            with model_router.timed(stage, model):
+                response = self.client.chat.completions.create(
+                    model=model,
+                    messages=[{"role": "user", "content": prompt}],
+                    temperature=TEMPERATURE
+                )
+            
+            content = response.choices[0].message.content
+            self._remember(stage, key, profile, model, content)
+            return content
+    
+    def _stream(self, stage, prompt, profile=None):
+        """Send a prompt to the model and yield the response as it is generated"""
+        role = STAGE_ROLES[stage]
+        start = time.perf_counter()
+        model = model_router.model(stage)
+        key = self.cache.make_key(profile, prompt, model, TEMPERATURE)
+        cached = self._cached(stage, key, profile, model)
+        if cached is not None:
+            metrics.STAGE_SECONDS.observe(time.perf_counter() - start, stage=stage, role=role)
+            yield cached
+            return
+        
+        # Labels apply only to the request itself; a context held across
+        # yields would leak into the caller's context between chunks
+        with metrics.labels(stage=stage, role=role):
+            stream = self.client.chat.completions.create(
+                model=model,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=TEMPERATURE,
+                stream=True
+            )
+        
+        chunks = []
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                chunks.append(chunk.choices[0].delta.content)
+                yield chunk.choices[0].delta.content
+        
+        # Only complete responses are cached; an abandoned stream is not
+        self._remember(stage, key, profile, model, "".join(chunks))
+        elapsed = time.perf_counter() - start
+        metrics.STAGE_SECONDS.observe(elapsed, stage=stage, role=role)
+        model_router.observe(stage, model, elapsed)
+    
+    def _meal_plan_prompt(self, user_profile):
+        """Build the prompt for a personalized meal plan"""
         prompt = f"""
         As a nutritionist, create a personalized meal plan based on:
         
@@ -34,16 +147,20 @@ class SimpleHealthAdvisor:
         Format the response in a clear, structured way.
         """
         
-        response = self.client.chat.completions.create(
-            model="gpt-4",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.7
-        )
-        
-        return response.choices[0].message.content
+        return prompt
     
-    def create_workout_plan(self, user_profile):
-        """Create a personalized workout plan"""
+    def create_meal_plan(self, user_profile):
+        """Create a personalized meal plan"""
+        profile = canonical_profile(user_profile)
+        return self._complete("meal_plan", self._meal_plan_prompt(profile), profile)
+    
+    def stream_meal_plan(self, user_profile):
+        """Stream a personalized meal plan as text chunks"""
+        profile = canonical_profile(user_profile)
+        return self._stream("meal_plan", self._meal_plan_prompt(profile), profile)
+    
+    def _workout_plan_prompt(self, user_profile):
+        """Build the prompt for a personalized workout plan"""
         prompt = f"""
         As a fitness trainer, design a workout plan considering:
         
@@ -66,16 +183,20 @@ class SimpleHealthAdvisor:
         Format the response in a clear, structured way.
         """
         
-        response = self.client.chat.completions.create(
-            model="gpt-4",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.7
-        )
-        
-        return response.choices[0].message.content
+        return prompt
     
-    def create_mindfulness_plan(self, user_profile):
-        """Create a mindfulness plan"""
+    def create_workout_plan(self, user_profile):
+        """Create a personalized workout plan"""
+        profile = canonical_profile(user_profile)
+        return self._complete("workout_plan", self._workout_plan_prompt(profile), profile)
+    
+    def stream_workout_plan(self, user_profile):
+        """Stream a personalized workout plan as text chunks"""
+        profile = canonical_profile(user_profile)
+        return self._stream("workout_plan", self._workout_plan_prompt(profile), profile)
+    
+    def _mindfulness_plan_prompt(self, user_profile):
+        """Build the prompt for a mindfulness plan"""
         prompt = f"""
         As a mindfulness expert, create a mindfulness plan based on:
         
@@ -96,16 +217,30 @@ class SimpleHealthAdvisor:
         Format the response in a clear, structured way.
         """
         
-        response = self.client.chat.completions.create(
-            model="gpt-4",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.7
-        )
-        
-        return response.choices[0].message.content
+        return prompt
     
-    def create_integrated_schedule(self, meal_plan, workout_plan, mindfulness_plan):
-        """Create an integrated daily schedule"""
+    def create_mindfulness_plan(self, user_profile):
+        """Create a mindfulness plan"""
+        profile = canonical_profile(user_profile)
+        return self._complete("mindfulness_plan", self._mindfulness_plan_prompt(profile), profile)
+    
+    def stream_mindfulness_plan(self, user_profile):
+        """Stream a mindfulness plan as text chunks"""
+        profile = canonical_profile(user_profile)
+        return self._stream("mindfulness_plan", self._mindfulness_plan_prompt(profile), profile)
+    
+    def create_initial_plans(self, user_profile):
+        """Create the meal, workout and mindfulness plans concurrently"""
+        # The three plans only read the user profile, so they can be requested
+        # together and the caller waits for the slowest one instead of all three
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            meal_plan = executor.submit(self.create_meal_plan, user_profile)
+            workout_plan = executor.submit(self.create_workout_plan, user_profile)
+            mindfulness_plan = executor.submit(self.create_mindfulness_plan, user_profile)
+            return meal_plan.result(), workout_plan.result(), mindfulness_plan.result()
+    
+    def _integrated_schedule_prompt(self, meal_plan, workout_plan, mindfulness_plan):
+        """Build the prompt for an integrated daily schedule"""
         prompt = f"""
         As a schedule coordinator, create an integrated daily schedule using:
         
@@ -130,20 +265,22 @@ class SimpleHealthAdvisor:
         Format the response in a clear, structured way.
         """
         
-        response = self.client.chat.completions.create(
-            model="gpt-4",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.7
-        )
-        
-        return response.choices[0].message.content
+        return prompt
     
-    def create_progress_report(self, history, integrated_schedule):
-        """Create a weekly progress report"""
+    def create_integrated_schedule(self, meal_plan, workout_plan, mindfulness_plan):
+        """Create an integrated daily schedule"""
+        return self._complete("integrated_schedule", self._integrated_schedule_prompt(meal_plan, workout_plan, mindfulness_plan))
+    
+    def stream_integrated_schedule(self, meal_plan, workout_plan, mindfulness_plan):
+        """Stream an integrated daily schedule as text chunks"""
+        return self._stream("integrated_schedule", self._integrated_schedule_prompt(meal_plan, workout_plan, mindfulness_plan))
+    
+    def _progress_report_prompt(self, history, integrated_schedule):
+        """Build the prompt for a weekly progress report"""
         prompt = f"""
         As a health coach, generate a weekly progress report based on:
         
-        History: {history}
+        Progress summary (this and last week's rollups, and streaks): {history}
         Current Schedule: {integrated_schedule}
         
         Analyze:
@@ -161,10 +298,12 @@ class SimpleHealthAdvisor:
         Format the response in a clear, structured way.
         """
         
-        response = self.client.chat.completions.create(
-            model="gpt-4",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.7
-        )
-        
-        return response.choices[0].message.content 
\ No newline at end of file
+        return prompt
+    
+    def create_progress_report(self, history, integrated_schedule):
+        """Create a weekly progress report"""
+        return self._complete("progress_report", self._progress_report_prompt(history, integrated_schedule))
+    
+    def stream_progress_report(self, history, integrated_schedule):
+        """Stream a weekly progress report as text chunks"""
+        return self._stream("progress_report", self._progress_report_prompt(history, integrated_schedule))
@@ -0,0 +1,89 @@
+"""Pre-generate plans for sidebar profiles so the app can serve them without LLM calls.
+
+Builds each user_profile exactly as the Streamlit sidebar does, runs the crew
+pipeline for it with bounded concurrency and writes the results to the plan
+store that app.py checks before generating.
+
+Usage:
+    python warm_cache.py --max-selected 2 --limit 200 --workers 4
+    python warm_cache.py --sample 500 --seed 7
+"""
+import argparse
+import itertools
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from plan_store import PlanStore
+from profiles import build_user_profile, iter_sidebar_selections, profile_key, random_sidebar_selection
+from settings import PLAN_STORE_PATH
+
+
+def select_profiles(args):
+    """Return the (key, profile) pairs to warm, without duplicates"""
+    if args.sample:
+        rng = random.Random(args.seed)
+        selections = (random_sidebar_selection(rng) for _ in itertools.count())
+    else:
+        selections = iter_sidebar_selections(max_selected=args.max_selected)
+
+    wanted = args.sample or args.limit
+    profiles = {}
+    for selection in selections:
+        user_profile = build_user_profile(**selection)
+        profiles.setdefault(profile_key(user_profile), user_profile)
+        if wanted and len(profiles) >= wanted:
+            break
+    return list(profiles.items())
+
+
+def warm(store, key, user_profile):
+    from health_advisor import run_health_coach
+
+    results = run_health_coach(user_profile)
+    store.put(key, user_profile, results)
+    return results["usage"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-generate plans for sidebar profiles")
+    parser.add_argument("--db", default=PLAN_STORE_PATH, help="Plan store SQLite file")
+    parser.add_argument("--max-selected", type=int, default=2,
+                        help="Most options picked in each multiselect when enumerating")
+    parser.add_argument("--limit", type=int, default=None, help="Stop after this many profiles")
+    parser.add_argument("--sample", type=int, default=None,
+                        help="Warm this many randomly sampled profiles instead of enumerating")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for --sample")
+    parser.add_argument("--workers", type=int, default=4, help="Profiles generated at once")
+    parser.add_argument("--force", action="store_true", help="Regenerate profiles already in the store")
+    parser.add_argument("--dry-run", action="store_true", help="Only count the profiles to warm")
+    args = parser.parse_args()
+
+    store = PlanStore(args.db)
+    profiles = select_profiles(args)
+    if not args.force:
+        profiles = [(key, profile) for key, profile in profiles if not store.contains(key)]
+    print(f"{len(profiles)} profiles to warm into {args.db}")
+    if args.dry_run or not profiles:
+        return
+
+    start = time.perf_counter()
+    done = failed = tokens = 0
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = {executor.submit(warm, store, key, profile): key for key, profile in profiles}
+        for future in as_completed(futures):
+            try:
+                tokens += future.result()["total_tokens"]
+                done += 1
+            except Exception as e:
+                failed += 1
+                print(f"Failed to warm {futures[future][:12]}: {str(e)}")
+            print(f"[{done + failed}/{len(profiles)}] warmed {done}, failed {failed}")
+
+    elapsed = time.perf_counter() - start
+    print(f"Warmed {done} profiles in {elapsed:.1f}s ({failed} failed, {tokens} tokens); "
+          f"store now holds {len(store)} plans")
+
+
+if __name__ == "__main__":
+    main()